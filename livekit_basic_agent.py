@@ -9,13 +9,117 @@ from livekit.agents import Agent, AgentSession, RunContext
 from livekit.agents.llm import function_tool
 from livekit.plugins import openai, deepgram, silero, cartesia
 from datetime import datetime
+import itertools
 import os
 
 # Load environment variables
 load_dotenv(".env")
 
+# The spoken time only has minute resolution, so format it once per minute
+_time_cache = {"minute": None, "str": None}
+
+
+def _current_datetime_str() -> str:
+    now = datetime.now()
+    key = now.replace(second=0, microsecond=0)
+    if key != _time_cache["minute"]:
+        _time_cache["minute"] = key
+        _time_cache["str"] = now.strftime("%B %d, %Y at %I:%M %p")
+    return _time_cache["str"]
+
+
+def _format_search_results(listings) -> str:
+    """Render the spoken description of a city's listings."""
+    parts = []
+    for i, listing in enumerate(listings, 1):
+        parts.append(f"Option {i} is {listing['name']} located at {listing['address']}. ")
+        parts.append(f"It costs ${listing['price']} per night and includes {', '.join(listing['amenities'])}. ")
+        parts.append(f"The ID is {listing['id']}. ")
+
+    parts.append("Which one would you like to know more about or book?")
+    return ''.join(parts)
+
+
 class Assistant(Agent):
 
+    # Mock Airbnb database
+    _AIRBNBS = {
+        "san francisco": [
+            {
+                "id": "sf001",
+                "name": "Cozy Downtown Loft",
+                "address": "123 Market Street, San Francisco, CA",
+                "price": 150,
+                "amenities": ["WiFi", "Kitchen", "Workspace"],
+            },
+            {
+                "id": "sf002",
+                "name": "Victorian House with Bay Views",
+                "address": "456 Castro Street, San Francisco, CA",
+                "price": 220,
+                "amenities": ["WiFi", "Parking", "Washer/Dryer", "Bay Views"],
+            },
+            {
+                "id": "sf003",
+                "name": "Modern Studio near Golden Gate",
+                "address": "789 Presidio Avenue, San Francisco, CA",
+                "price": 180,
+                "amenities": ["WiFi", "Kitchen", "Pet Friendly"],
+            },
+        ],
+        "new york": [
+            {
+                "id": "ny001",
+                "name": "Brooklyn Brownstone Apartment",
+                "address": "321 Bedford Avenue, Brooklyn, NY",
+                "price": 175,
+                "amenities": ["WiFi", "Kitchen", "Backyard Access"],
+            },
+            {
+                "id": "ny002",
+                "name": "Manhattan Skyline Penthouse",
+                "address": "555 Fifth Avenue, Manhattan, NY",
+                "price": 350,
+                "amenities": ["WiFi", "Gym", "Doorman", "City Views"],
+            },
+            {
+                "id": "ny003",
+                "name": "Artsy East Village Loft",
+                "address": "88 Avenue A, Manhattan, NY",
+                "price": 195,
+                "amenities": ["WiFi", "Washer/Dryer", "Exposed Brick"],
+            },
+        ],
+        "los angeles": [
+            {
+                "id": "la001",
+                "name": "Venice Beach Bungalow",
+                "address": "234 Ocean Front Walk, Venice, CA",
+                "price": 200,
+                "amenities": ["WiFi", "Beach Access", "Patio"],
+            },
+            {
+                "id": "la002",
+                "name": "Hollywood Hills Villa",
+                "address": "777 Mulholland Drive, Los Angeles, CA",
+                "price": 400,
+                "amenities": ["WiFi", "Pool", "City Views", "Hot Tub"],
+            },
+        ],
+    }
+
+    _LISTINGS_BY_ID = {
+        listing['id']: listing
+        for listings in _AIRBNBS.values()
+        for listing in listings
+    }
+
+    # Listing descriptions never change, so render them once per city
+    _SEARCH_CACHE = {
+        city_lower: _format_search_results(listings)
+        for city_lower, listings in _AIRBNBS.items()
+    }
+
     def __init__(self):
         super().__init__(
             instructions="""You are a helpful and friendly Airbnb voice assistant.
@@ -27,78 +131,16 @@ class Assistant(Agent):
             Just describe the properties conversationally."""
         )
 
-        # Mock Airbnb database
-        self.airbnbs = {
-            "san francisco": [
-                {
-                    "id": "sf001",
-                    "name": "Cozy Downtown Loft",
-                    "address": "123 Market Street, San Francisco, CA",
-                    "price": 150,
-                    "amenities": ["WiFi", "Kitchen", "Workspace"],
-                },
-                {
-                    "id": "sf002",
-                    "name": "Victorian House with Bay Views",
-                    "address": "456 Castro Street, San Francisco, CA",
-                    "price": 220,
-                    "amenities": ["WiFi", "Parking", "Washer/Dryer", "Bay Views"],
-                },
-                {
-                    "id": "sf003",
-                    "name": "Modern Studio near Golden Gate",
-                    "address": "789 Presidio Avenue, San Francisco, CA",
-                    "price": 180,
-                    "amenities": ["WiFi", "Kitchen", "Pet Friendly"],
-                },
-            ],
-            "new york": [
-                {
-                    "id": "ny001",
-                    "name": "Brooklyn Brownstone Apartment",
-                    "address": "321 Bedford Avenue, Brooklyn, NY",
-                    "price": 175,
-                    "amenities": ["WiFi", "Kitchen", "Backyard Access"],
-                },
-                {
-                    "id": "ny002",
-                    "name": "Manhattan Skyline Penthouse",
-                    "address": "555 Fifth Avenue, Manhattan, NY",
-                    "price": 350,
-                    "amenities": ["WiFi", "Gym", "Doorman", "City Views"],
-                },
-                {
-                    "id": "ny003",
-                    "name": "Artsy East Village Loft",
-                    "address": "88 Avenue A, Manhattan, NY",
-                    "price": 195,
-                    "amenities": ["WiFi", "Washer/Dryer", "Exposed Brick"],
-                },
-            ],
-            "los angeles": [
-                {
-                    "id": "la001",
-                    "name": "Venice Beach Bungalow",
-                    "address": "234 Ocean Front Walk, Venice, CA",
-                    "price": 200,
-                    "amenities": ["WiFi", "Beach Access", "Patio"],
-                },
-                {
-                    "id": "la002",
-                    "name": "Hollywood Hills Villa",
-                    "address": "777 Mulholland Drive, Los Angeles, CA",
-                    "price": 400,
-                    "amenities": ["WiFi", "Pool", "City Views", "Hot Tub"],
-                },
-            ],
-        }
-
+        self._booking_seq = itertools.count(1001)
         self.bookings = []
 
+    def _not_found_msg(self, city: str) -> str:
+        return f"Sorry, I don't have any Airbnb listings for {city} at the moment. Available cities are: San Francisco, New York, and Los Angeles."
+
     @function_tool
     async def get_current_date_and_time(self, context: RunContext) -> str:
         """Get the current date and time."""
-        current_datetime = datetime.now().strftime("%B %d, %Y at %I:%M %p")
+        current_datetime = _current_datetime_str()
         return f"The current date and time is {current_datetime}"
 
     @function_tool
@@ -109,39 +151,24 @@ class Assistant(Agent):
             city: The city name to search for Airbnbs (e.g., 'San Francisco', 'New York', 'Los Angeles')
         """
         city_lower = city.lower()
+        cached = self._SEARCH_CACHE.get(city_lower)
 
-        if city_lower not in self.airbnbs:
-            return f"Sorry, I don't have any Airbnb listings for {city} at the moment. Available cities are: San Francisco, New York, and Los Angeles."
-
-        listings = self.airbnbs[city_lower]
-        result = f"I found {len(listings)} available Airbnbs in {city}. "
-
-        for i, listing in enumerate(listings, 1):
-            result += f"Option {i} is {listing['name']} located at {listing['address']}. "
-            result += f"It costs ${listing['price']} per night and includes {', '.join(listing['amenities'])}. "
-            result += f"The ID is {listing['id']}. "
+        if cached is None:
+            return self._not_found_msg(city)
 
-        result += "Which one would you like to know more about or book?"
-        return result
+        return f"I found {len(self._AIRBNBS[city_lower])} available Airbnbs in {city}. {cached}"
 
     @function_tool
     async def book_airbnb(self, context: RunContext, airbnb_id: str, guest_name: str, check_in_date: str, check_out_date: str) -> str:
         # Find the Airbnb
-        airbnb = None
-        for city_listings in self.airbnbs.values():
-            for listing in city_listings:
-                if listing['id'] == airbnb_id:
-                    airbnb = listing
-                    break
-            if airbnb:
-                break
+        airbnb = self._LISTINGS_BY_ID.get(airbnb_id)
 
         if not airbnb:
             return f"Sorry, I couldn't find an Airbnb with ID {airbnb_id}. Please search for available listings first."
 
         # Create booking
         booking = {
-            "confirmation_number": f"BK{len(self.bookings) + 1001}",
+            "confirmation_number": f"BK{next(self._booking_seq)}",
             "airbnb_name": airbnb['name'],
             "address": airbnb['address'],
             "guest_name": guest_name,
@@ -152,28 +179,39 @@ class Assistant(Agent):
 
         self.bookings.append(booking)
 
-        result = f"Great news! Your booking is confirmed. "
-        result += f"Your confirmation number is {booking['confirmation_number']}. "
-        result += f"You've booked {booking['airbnb_name']} located at {booking['address']}. "
-        result += f"The reservation is for {booking['guest_name']} "
-        result += f"from {booking['check_in']} to {booking['check_out']}. "
-        result += f"The nightly rate is ${booking['total_price']}. "
-        result += f"You'll receive a confirmation email shortly. Have a great stay!"
+        return ''.join([
+            "Great news! Your booking is confirmed. ",
+            f"Your confirmation number is {booking['confirmation_number']}. ",
+            f"You've booked {booking['airbnb_name']} located at {booking['address']}. ",
+            f"The reservation is for {booking['guest_name']} ",
+            f"from {booking['check_in']} to {booking['check_out']}. ",
+            f"The nightly rate is ${booking['total_price']}. ",
+            "You'll receive a confirmation email shortly. Have a great stay!",
+        ])        
+
+def prewarm(proc: agents.JobProcess):
+    """Build the session-independent pipeline pieces once per worker process."""
+    proc.userdata["stt"] = deepgram.STT(
+        model="nova-2",
+        language="en",
+        # Fix "vertical bar" hallucination issue
+        interim_results=False,
+        punctuate=True,
+        smart_format=True,
+    )
+    # Improve VAD sensitivity to reduce false positives
+    proc.userdata["vad"] = silero.VAD.load(
+        min_speech_duration=0.3,  # Minimum 300ms of speech
+        min_silence_duration=0.5,  # Wait 500ms of silence before stopping
+        padding_duration=0.2,     # Add 200ms padding
+    )
 
-        return result        
 
 async def entrypoint(ctx: agents.JobContext):
     """Entry point for the agent."""
 
     session = AgentSession(
-        stt=deepgram.STT(
-            model="nova-2",
-            language="en",
-            # Fix "vertical bar" hallucination issue
-            interim_results=False,
-            punctuate=True,
-            smart_format=True,
-        ),
+        stt=ctx.proc.userdata["stt"],
         llm=openai.LLM.with_ollama(
             model=os.getenv("OLLAMA_MODEL", "llama3.2"),
             base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1"),
@@ -181,15 +219,16 @@ async def entrypoint(ctx: agents.JobContext):
         # Cartesia TTS (free tier available at https://play.cartesia.ai/)
         tts=cartesia.TTS(
             api_key=os.getenv("CARTESIA_API_KEY"),
+            model="sonic-turbo",  # Low-latency model for voice
             voice="f786b574-daa5-4673-aa0c-cbe3e8534c02",  # Default voice
             speed=0.9,  # Slightly slower for smoother delivery
+            encoding="pcm_s16le",
+            sample_rate=16000,  # Voice-band audio, fewer bytes per chunk
         ),
-        # Improve VAD sensitivity to reduce false positives
-        vad=silero.VAD.load(
-            min_speech_duration=0.3,  # Minimum 300ms of speech
-            min_silence_duration=0.5,  # Wait 500ms of silence before stopping
-            padding_duration=0.2,     # Add 200ms padding
-        ),
+        vad=ctx.proc.userdata["vad"],
+        # Start the LLM reply on the final transcript, before end of turn is confirmed;
+        # discarded if the user keeps talking
+        preemptive_generation=True,
     )
 
     # Start the session
@@ -205,4 +244,4 @@ async def entrypoint(ctx: agents.JobContext):
 
 if __name__ == "__main__":
     # Run the agent
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -21,12 +21,12 @@ from livekit.agents import (
 from livekit.agents.llm import function_tool
 from livekit.plugins import openai, deepgram, silero, cartesia
 from datetime import datetime
+import asyncio
 import logging
 import os
+import sys
 import httpx
 import re
-# uncomment to enable Krisp background voice/noise cancellation
-from livekit.plugins import noise_cancellation
 load_dotenv(".env")
 
 # Configure logging
@@ -34,38 +34,68 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Whole table rows: two or more pipes, or a separator made only of -|: and spaces
+_TABLE_LINE = re.compile(r'^(?:[^\n|]*\|[^\n|]*\|[^\n]*|(?:[^\S\n]|[-|:])+)\n', re.MULTILINE)
+_BOLD_STAR = re.compile(r'\*\*(.+?)\*\*')
+_ITALIC_STAR = re.compile(r'\*(.+?)\*')
+_BOLD_UNDER = re.compile(r'__(.+?)__')
+_ITALIC_UNDER = re.compile(r'_(.+?)_')
+_BULLET = re.compile(r'^\s*[-*+]\s+', re.MULTILINE)
+_MULTINL = re.compile(r'\n{3,}')
+_MULTISPACE = re.compile(r' {2,}')
+# Line-level markup that contains no |, * or _ (bullets, ---/::: or blank rows)
+_LINE_MARKUP = re.compile(r'^(?:\s*[-+]\s|(?:[^\S\n]|[-:])+$)', re.MULTILINE)
+
+
 def clean_text_for_voice(text: str) -> str:
 
-    # Remove markdown tables (lines with multiple pipes)
-    lines = text.split('\n')
-    cleaned_lines = []
-    for line in lines:
-        if line.count('|') >= 2 or re.match(r'^[\s\-|:]+$', line):
-            continue
-        cleaned_lines.append(line)
+    # Fast path: plain sentences (the common case) need no cleanup passes
+    if ('|' not in text and '*' not in text and '_' not in text
+            and '  ' not in text and '\n\n\n' not in text
+            and not _LINE_MARKUP.search(text)):
+        return text.strip()
 
-    text = '\n'.join(cleaned_lines)
+    # Remove markdown tables (lines with multiple pipes); terminating the
+    # last line lets one pass drop each row together with its newline
+    text = _TABLE_LINE.sub('', text + '\n')[:-1]
 
     # Remove remaining pipes
     text = text.replace('|', '')
 
-    # Remove markdown bold/italic
-    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)  # **bold**
-    text = re.sub(r'\*(.+?)\*', r'\1', text)      # *italic*
-    text = re.sub(r'__(.+?)__', r'\1', text)      # __bold__
-    text = re.sub(r'_(.+?)_', r'\1', text)        # _italic_
+    # Remove markdown bold/italic (each pass only runs if its marker is present)
+    if '*' in text:
+        text = _BOLD_STAR.sub(r'\1', text)     # **bold**
+        text = _ITALIC_STAR.sub(r'\1', text)   # *italic*
+    if '_' in text:
+        text = _BOLD_UNDER.sub(r'\1', text)    # __bold__
+        text = _ITALIC_UNDER.sub(r'\1', text)  # _italic_
 
     # Remove markdown bullets
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
+    text = _BULLET.sub('', text)
 
     # Remove extra whitespace
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    text = re.sub(r' {2,}', ' ', text)
+    if '\n\n\n' in text:
+        text = _MULTINL.sub('\n\n', text)
+    if '  ' in text:
+        text = _MULTISPACE.sub(' ', text)
 
     return text.strip()
 
 
-async def get_llm_instance():
+# The spoken time only has minute resolution, so format it once per minute
+_time_cache = {"minute": None, "str": None}
+
+
+def _current_datetime_str() -> str:
+    now = datetime.now()
+    key = now.replace(second=0, microsecond=0)
+    if key != _time_cache["minute"]:
+        _time_cache["minute"] = key
+        _time_cache["str"] = now.strftime("%B %d, %Y at %I:%M %p")
+    return _time_cache["str"]
+
+
+async def get_llm_instance(http_client: httpx.AsyncClient):
     """
     Get LLM instance - tries Ollama first, falls back to Groq.
     Returns configured LLM instance.
@@ -80,16 +110,16 @@ async def get_llm_instance():
             logger.info(f"Attempting to use Ollama model: {ollama_model} at {ollama_base_url}")
 
             # Test if Ollama is reachable
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                health_url = ollama_base_url.replace("/v1", "") + "/api/tags"
-                response = await client.get(health_url)
-                response.raise_for_status()
+            health_url = ollama_base_url.replace("/v1", "") + "/api/tags"
+            response = await http_client.get(health_url)
+            response.raise_for_status()
 
             logger.info("✓ Ollama is available - using local model")
             return openai.LLM.with_ollama(
                 model=ollama_model,
                 base_url=ollama_base_url,
                 temperature=0.7,
+                parallel_tool_calls=True,  # independent MCP calls run concurrently
             )
 
         except Exception as e:
@@ -103,12 +133,50 @@ async def get_llm_instance():
             base_url="https://api.groq.com/openai/v1",
             api_key=groq_api_key,
             temperature=0.7,
+            parallel_tool_calls=True,  # independent MCP calls run concurrently
         )
     else:
         raise ValueError("No LLM configured - please set either OLLAMA_MODEL or GROQ_API_KEY in .env")
 
+MCP_SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp-server-airbnb")
+
+
+def _mcp_server_command():
+    """
+    Resolve how to launch the Airbnb MCP server.
+    Prefers the server's own virtualenv so each session spawns plain
+    `python server.py` instead of paying for `uv run` environment resolution.
+    """
+    if sys.platform == "win32":
+        venv_python = os.path.join(MCP_SERVER_DIR, ".venv", "Scripts", "python.exe")
+    else:
+        venv_python = os.path.join(MCP_SERVER_DIR, ".venv", "bin", "python")
+
+    if os.path.exists(venv_python):
+        return venv_python, [os.path.join(MCP_SERVER_DIR, "server.py")]
+    return "uv", ["--directory", MCP_SERVER_DIR, "run", "python", "server.py"]
+
+
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    """Build the session-independent pipeline pieces once per worker process."""
+    # Speech-to-Text
+    proc.userdata["stt"] = deepgram.STT(
+        model="nova-2",
+        language="en",
+        # Fix "vertical bar" hallucination issue
+        interim_results=False,
+        punctuate=True,
+        smart_format=True,
+    )
+
+    # Voice Activity Detection - Improved sensitivity
+    proc.userdata["vad"] = silero.VAD.load(
+        min_speech_duration=0.3,  # Minimum 300ms of speech
+        min_silence_duration=0.5,  # Wait 500ms of silence before stopping
+        padding_duration=0.2,     # Add 200ms padding
+    )
+
+    proc.userdata["mcp_command"] = _mcp_server_command()
 
 
 class Assistant(Agent):
@@ -126,6 +194,11 @@ class Assistant(Agent):
             - airbnb_trip_budget: Calculate total trip cost
             - airbnb_smart_filter: Advanced search with filters
             - airbnb_compare_listings: Compare multiple listings side-by-side
+            - airbnb_search_with_details: Search and get full details for the top results in one call
+
+            When a request needs several independent lookups (for example two
+            cities or two date ranges), call the tools together in one turn
+            instead of one after another.
 
             CRITICAL VOICE FORMATTING RULES:
             - This is a VOICE conversation, not text chat
@@ -150,7 +223,7 @@ class Assistant(Agent):
     @function_tool
     async def get_current_date_and_time(self, context: RunContext) -> str:
         """Get the current date and time."""
-        current_datetime = datetime.now().strftime("%B %d, %Y at %I:%M %p")
+        current_datetime = _current_datetime_str()
         return f"The current date and time is {current_datetime}"       
     
     async def on_enter(self):
@@ -183,51 +256,50 @@ async def entrypoint(ctx: agents.JobContext):
 
     logger.info(f"Agent started in room: {ctx.room.name}")
 
-    # Get LLM instance (tries Ollama first, falls back to Groq)
-    llm_instance = await get_llm_instance()
+    # Client for the Ollama health check; owned by this job's event loop and
+    # closed when the job shuts down
+    http_client = httpx.AsyncClient(
+        timeout=1.5,
+        limits=httpx.Limits(max_keepalive_connections=4),
+    )
+    ctx.add_shutdown_callback(http_client.aclose)
+
+    # Probe for the LLM (tries Ollama first, falls back to Groq) and join the
+    # room in the background while the rest of the pipeline is built
+    llm_task = asyncio.create_task(get_llm_instance(http_client))
+    connect_task = asyncio.create_task(ctx.connect())
+    await asyncio.sleep(0)  # let the probe and the connect send their requests first
+
+    # Text-to-Speech - Cartesia (Free Tier)
+    tts = cartesia.TTS(
+        api_key=os.getenv("CARTESIA_API_KEY"),
+        model="sonic-turbo",  # Low-latency model for voice
+        voice="f786b574-daa5-4673-aa0c-cbe3e8534c02",
+        speed=0.9,  # Slightly slower for smoother delivery
+        encoding="pcm_s16le",
+        sample_rate=16000,  # Voice-band audio, fewer bytes per chunk
+    )
+
+    # STT, VAD and the launch command are built once per worker process in prewarm
+    mcp_command, mcp_args = ctx.proc.userdata["mcp_command"]
+
+    # Large Language Model - Ollama (local) or Groq (cloud)
+    llm_instance, _ = await asyncio.gather(llm_task, connect_task)
 
     # Configure the voice pipeline
     session = AgentSession(
-        # Speech-to-Text
-        stt=deepgram.STT(
-            model="nova-2",
-            language="en",
-            # Fix "vertical bar" hallucination issue
-            interim_results=False,
-            punctuate=True,
-            smart_format=True,
-        ),
-
-        # Large Language Model - Ollama (local) or Groq (cloud)
+        stt=ctx.proc.userdata["stt"],
         llm=llm_instance,
-
-        # Text-to-Speech - Cartesia (Free Tier)
-        tts=cartesia.TTS(
-            api_key=os.getenv("CARTESIA_API_KEY"),
-            voice="f786b574-daa5-4673-aa0c-cbe3e8534c02",
-            speed=0.9,  # Slightly slower for smoother delivery
-        ),
-        
-        # Voice Activity Detection - Improved sensitivity
-        vad=silero.VAD.load(
-            min_speech_duration=0.3,  # Minimum 300ms of speech
-            min_silence_duration=0.5,  # Wait 500ms of silence before stopping
-            padding_duration=0.2,     # Add 200ms padding
-        ),
+        tts=tts,
+        vad=ctx.proc.userdata["vad"],
+        # Start the LLM reply on the final transcript, before end of turn is confirmed;
+        # discarded if the user keeps talking
+        preemptive_generation=True,
 
         # MCP servers - Your Airbnb server via Stdio (RECOMMENDED)
         # Each voice session gets isolated MCP instance - clean & production-ready
         mcp_servers=[
-            mcp.MCPServerStdio(
-                command="uv",
-                args=[
-                    "--directory",
-                    os.path.join(os.path.dirname(__file__), "mcp-server-airbnb"),
-                    "run",
-                    "python",
-                    "server.py"
-                ]
-            )
+            mcp.MCPServerStdio(command=mcp_command, args=mcp_args)
         ],
     )
     
@@ -237,6 +309,7 @@ async def entrypoint(ctx: agents.JobContext):
         agent=Assistant(),
         # room_input_options=RoomInputOptions(
             # Enable noise cancellation
+            # (requires: from livekit.plugins import noise_cancellation)
             # noise_cancellation=noise_cancellation.BVC(),
             # For telephony, use: noise_cancellation.BVCTelephony()
         # ),
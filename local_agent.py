@@ -6,36 +6,150 @@ No OpenAI API key required - uses Ollama LLM + Edge TTS (Microsoft)
 
 from dotenv import load_dotenv
 from livekit import agents
-from livekit.agents import Agent, AgentSession, RunContext
+from livekit.agents import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    Agent,
+    AgentSession,
+    APIConnectOptions,
+    RunContext,
+    tts,
+    utils,
+)
 from livekit.agents.llm import function_tool
 from livekit.plugins import openai, deepgram, silero
-import edge_tts
 import asyncio
 import os
 from datetime import datetime
+import itertools
 
 # Load environment variables
 load_dotenv(".env")
 
+EDGE_TTS_SAMPLE_RATE = 24000
+
+
+# The spoken time only has minute resolution, so format it once per minute
+_time_cache = {"minute": None, "str": None}
+
+
+def _current_datetime_str() -> str:
+    now = datetime.now()
+    key = now.replace(second=0, microsecond=0)
+    if key != _time_cache["minute"]:
+        _time_cache["minute"] = key
+        _time_cache["str"] = now.strftime("%B %d, %Y at %I:%M %p")
+    return _time_cache["str"]
+
+
 class EdgeTTSWrapper:
     """Wrapper for Edge TTS to work with LiveKit"""
 
     def __init__(self, voice="en-US-AriaNeural"):
         self.voice = voice
-        self.communicate = None
 
-    async def synthesize(self, text: str):
-        """Synthesize speech from text"""
+    async def stream(self, text: str):
+        """Yield MP3 audio chunks as Edge TTS produces them"""
+        import edge_tts  # only needed once the agent actually speaks
+
         communicate = edge_tts.Communicate(text, self.voice)
-        audio_data = b""
         async for chunk in communicate.stream():
             if chunk["type"] == "audio":
-                audio_data += chunk["data"]
-        return audio_data
+                yield chunk["data"]
+
+
+class EdgeTTSPlugin(tts.TTS):
+    """LiveKit TTS plugin backed by Edge TTS (no API key required)"""
+
+    def __init__(self, voice="en-US-AriaNeural"):
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=EDGE_TTS_SAMPLE_RATE,
+            num_channels=1,
+        )
+        self._edge = EdgeTTSWrapper(voice)
+
+    def synthesize(self, text: str, *,
+                   conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS) -> "EdgeTTSChunkedStream":
+        return EdgeTTSChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class EdgeTTSChunkedStream(tts.ChunkedStream):
+    """Pushes Edge TTS audio into LiveKit as soon as each chunk arrives"""
+
+    def __init__(self, *, tts: EdgeTTSPlugin, input_text: str, conn_options: APIConnectOptions):
+        super().__init__(tts=tts, input_text=input_text, conn_options=conn_options)
+        self._edge = tts._edge
+
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        # Edge TTS returns 24kHz mono MP3; the emitter decodes it to PCM frames
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=EDGE_TTS_SAMPLE_RATE,
+            num_channels=1,
+            mime_type="audio/mpeg",
+        )
+        async for data in self._edge.stream(self.input_text):
+            output_emitter.push(data)
+        output_emitter.flush()
+
+
+def _format_search_results(listings) -> str:
+    """Render the listing summary for a city."""
+    parts = []
+    for listing in listings:
+        parts.append(f"• {listing['name']}\n")
+        parts.append(f"  Address: {listing['address']}\n")
+        parts.append(f"  Price: ${listing['price']} per night\n")
+        parts.append(f"  Amenities: {', '.join(listing['amenities'])}\n")
+        parts.append(f"  ID: {listing['id']}\n\n")
+
+    return ''.join(parts)
+
 
 class Assistant(Agent):
     """Voice assistant with Airbnb booking capabilities."""
 
+    # Mock Airbnb database
+    _AIRBNBS = {
+        "san francisco": [
+            {
+                "id": "sf001",
+                "name": "Cozy Downtown Loft",
+                "address": "123 Market Street, San Francisco, CA",
+                "price": 150,
+                "amenities": ["WiFi", "Kitchen", "Workspace"],
+            },
+            {
+                "id": "sf002",
+                "name": "Victorian House with Bay Views",
+                "address": "456 Castro Street, San Francisco, CA",
+                "price": 220,
+                "amenities": ["WiFi", "Parking", "Washer/Dryer", "Bay Views"],
+            },
+        ],
+        "new york": [
+            {
+                "id": "ny001",
+                "name": "Brooklyn Brownstone Apartment",
+                "address": "321 Bedford Avenue, Brooklyn, NY",
+                "price": 175,
+                "amenities": ["WiFi", "Kitchen", "Backyard Access"],
+            },
+        ],
+    }
+
+    _LISTINGS_BY_ID = {
+        listing['id']: listing
+        for listings in _AIRBNBS.values()
+        for listing in listings
+    }
+
+    # Listing descriptions never change, so render them once per city
+    _SEARCH_CACHE = {
+        city_lower: _format_search_results(listings)
+        for city_lower, listings in _AIRBNBS.items()
+    }
+
     def __init__(self):
         super().__init__(
             instructions="""You are a helpful and friendly Airbnb voice assistant.
@@ -43,81 +157,40 @@ class Assistant(Agent):
             Keep your responses concise and natural, as if having a conversation."""
         )
 
-        # Mock Airbnb database
-        self.airbnbs = {
-            "san francisco": [
-                {
-                    "id": "sf001",
-                    "name": "Cozy Downtown Loft",
-                    "address": "123 Market Street, San Francisco, CA",
-                    "price": 150,
-                    "amenities": ["WiFi", "Kitchen", "Workspace"],
-                },
-                {
-                    "id": "sf002",
-                    "name": "Victorian House with Bay Views",
-                    "address": "456 Castro Street, San Francisco, CA",
-                    "price": 220,
-                    "amenities": ["WiFi", "Parking", "Washer/Dryer", "Bay Views"],
-                },
-            ],
-            "new york": [
-                {
-                    "id": "ny001",
-                    "name": "Brooklyn Brownstone Apartment",
-                    "address": "321 Bedford Avenue, Brooklyn, NY",
-                    "price": 175,
-                    "amenities": ["WiFi", "Kitchen", "Backyard Access"],
-                },
-            ],
-        }
-
+        self._booking_seq = itertools.count(1001)
         self.bookings = []
 
+    def _not_found_msg(self, city: str) -> str:
+        return f"Sorry, I don't have any Airbnb listings for {city}. Available cities: San Francisco, New York."
+
     @function_tool
     async def get_current_date_and_time(self, context: RunContext) -> str:
         """Get the current date and time."""
-        current_datetime = datetime.now().strftime("%B %d, %Y at %I:%M %p")
+        current_datetime = _current_datetime_str()
         return f"The current date and time is {current_datetime}"
 
     @function_tool
     async def search_airbnbs(self, context: RunContext, city: str) -> str:
         """Search for available Airbnbs in a city."""
         city_lower = city.lower()
+        cached = self._SEARCH_CACHE.get(city_lower)
 
-        if city_lower not in self.airbnbs:
-            return f"Sorry, I don't have any Airbnb listings for {city}. Available cities: San Francisco, New York."
-
-        listings = self.airbnbs[city_lower]
-        result = f"Found {len(listings)} Airbnbs in {city}:\n\n"
+        if cached is None:
+            return self._not_found_msg(city)
 
-        for listing in listings:
-            result += f"• {listing['name']}\n"
-            result += f"  Address: {listing['address']}\n"
-            result += f"  Price: ${listing['price']} per night\n"
-            result += f"  Amenities: {', '.join(listing['amenities'])}\n"
-            result += f"  ID: {listing['id']}\n\n"
-
-        return result
+        return f"Found {len(self._AIRBNBS[city_lower])} Airbnbs in {city}:\n\n{cached}"
 
     @function_tool
     async def book_airbnb(self, context: RunContext, airbnb_id: str, guest_name: str,
                          check_in_date: str, check_out_date: str) -> str:
         """Book an Airbnb."""
-        airbnb = None
-        for city_listings in self.airbnbs.values():
-            for listing in city_listings:
-                if listing['id'] == airbnb_id:
-                    airbnb = listing
-                    break
-            if airbnb:
-                break
+        airbnb = self._LISTINGS_BY_ID.get(airbnb_id)
 
         if not airbnb:
             return f"Sorry, couldn't find Airbnb with ID {airbnb_id}."
 
         booking = {
-            "confirmation_number": f"BK{len(self.bookings) + 1001}",
+            "confirmation_number": f"BK{next(self._booking_seq)}",
             "airbnb_name": airbnb['name'],
             "address": airbnb['address'],
             "guest_name": guest_name,
@@ -128,34 +201,26 @@ class Assistant(Agent):
 
         self.bookings.append(booking)
 
-        result = f"Booking confirmed!\n"
-        result += f"Confirmation: {booking['confirmation_number']}\n"
-        result += f"Property: {booking['airbnb_name']}\n"
-        result += f"Guest: {booking['guest_name']}\n"
-        result += f"Check-in: {booking['check_in']}\n"
-        result += f"Check-out: {booking['check_out']}\n"
-
-        return result
+        return ''.join([
+            "Booking confirmed!\n",
+            f"Confirmation: {booking['confirmation_number']}\n",
+            f"Property: {booking['airbnb_name']}\n",
+            f"Guest: {booking['guest_name']}\n",
+            f"Check-in: {booking['check_in']}\n",
+            f"Check-out: {booking['check_out']}\n",
+        ])
 
 async def entrypoint(ctx: agents.JobContext):
     """Entry point for the agent."""
 
-    # IMPORTANT: For now, we still need OpenAI TTS as LiveKit doesn't have a direct edge-tts plugin
-    # But we use Ollama for LLM (no cost)
-    # You can use Cartesia TTS (free tier) or keep using Deepgram for STT
-
-    print("\n⚠️  NOTE: TTS still requires OpenAI API key OR use Cartesia (has free tier)")
-    print("    To avoid ALL API costs, you'll need to implement custom TTS integration\n")
-
     session = AgentSession(
         stt=deepgram.STT(model="nova-2"),  # Requires Deepgram API key
         llm=openai.LLM.with_ollama(
             model=os.getenv("OLLAMA_MODEL", "llama3.2"),
             base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1"),
         ),
-        # TTS - This is the problem! OpenAI TTS needs API key
-        # Alternative: Use Cartesia (has free tier) or implement custom edge-tts
-        tts=openai.TTS(voice="echo"),  # Requires OpenAI API key
+        # Edge TTS (Microsoft) - free, no API key
+        tts=EdgeTTSPlugin(voice="en-US-AriaNeural"),
         vad=silero.VAD.load(),
     )
 
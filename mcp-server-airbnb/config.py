@@ -2,6 +2,7 @@
 Configuration module for Airbnb MCP Server
 """
 
+import os
 import sys
 
 # Airbnb Settings
@@ -11,6 +12,8 @@ REQUEST_TIMEOUT = 30
 
 # MCP Settings
 IGNORE_ROBOTS_TXT = "--ignore-robots-txt" in sys.argv
+# Tool responses are read by an LLM, so send compact JSON unless asked otherwise
+PRETTY_JSON = os.environ.get("AIRBNB_MCP_PRETTY", "0") == "1"
 
 # Logging Settings
 LOG_LEVEL = "INFO"
@@ -1,20 +1,13 @@
-from config import LOG_LEVEL, LOG_FORMAT
+from config import LOG_LEVEL, LOG_FORMAT, PRETTY_JSON
 import sys
 import logging
 import io
 import asyncio
-import json
 from mcp.server import Server
 from mcp import types
 from mcp.server.stdio import stdio_server
-from tools import (
-    airbnb_search,
-    airbnb_listing_details,
-    airbnb_price_analyzer,
-    airbnb_trip_budget,
-    airbnb_smart_filter,
-    airbnb_compare_listings
-)
+from utils import close_session, json_dumps
+from tools import TOOL_HANDLERS
 
 # Fix Windows UTF-8 encoding issues
 if sys.platform == 'win32':
@@ -22,6 +15,13 @@ if sys.platform == 'win32':
         sys.stdout.reconfigure(encoding='utf-8', errors='replace')
     if isinstance(sys.stderr, io.TextIOWrapper):
         sys.stderr.reconfigure(encoding='utf-8', errors='replace')
+else:
+    # uvloop is a faster drop-in event loop; it has no Windows support
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
 
 
 logging.basicConfig(
@@ -41,6 +41,9 @@ logger = logging.getLogger(__name__)
 # Create MCP server
 app = Server("airbnb_mcp_server")
 
+# Accepted by every tool; overrides AIRBNB_MCP_PRETTY for a single call
+_PRETTY_ARG = {"type": "boolean", "description": "Pretty-print the JSON response (default: compact)"}
+
 
 @app.list_tools()
 async def list_tools() -> list[types.Tool]:
@@ -57,7 +60,8 @@ async def list_tools() -> list[types.Tool]:
                     "checkout": {"type": "string", "description": "Check-out date (YYYY-MM-DD)"},
                     "adults": {"type": "number", "description": "Number of adults (default: 1)"},
                     "children": {"type": "number", "description": "Number of children (default: 0)"},
-                    "limit": {"type": "number", "description": "Number of results (default: 10)"}
+                    "limit": {"type": "number", "description": "Number of results (default: 10)"},
+                    "pretty": _PRETTY_ARG
                 },
                 "required": ["location"]
             }
@@ -72,7 +76,8 @@ async def list_tools() -> list[types.Tool]:
                     "checkin": {"type": "string", "description": "Check-in date (YYYY-MM-DD)"},
                     "checkout": {"type": "string", "description": "Check-out date (YYYY-MM-DD)"},
                     "adults": {"type": "number", "description": "Number of adults (default: 1)"},
-                    "children": {"type": "number", "description": "Number of children (default: 0)"}
+                    "children": {"type": "number", "description": "Number of children (default: 0)"},
+                    "pretty": _PRETTY_ARG
                 },
                 "required": ["id"]
             }
@@ -97,7 +102,8 @@ async def list_tools() -> list[types.Tool]:
                             },
                             "required": ["checkin", "checkout"]
                         }
-                    }
+                    },
+                    "pretty": _PRETTY_ARG
                 },
                 "required": ["location", "date_ranges"]
             }
@@ -113,7 +119,8 @@ async def list_tools() -> list[types.Tool]:
                     "checkout": {"type": "string", "description": "Check-out date (YYYY-MM-DD)"},
                     "adults": {"type": "number", "description": "Number of adults (default: 1)"},
                     "children": {"type": "number", "description": "Number of children (default: 0)"},
-                    "currency": {"type": "string", "description": "Currency code (default: INR)"}
+                    "currency": {"type": "string", "description": "Currency code (default: INR)"},
+                    "pretty": _PRETTY_ARG
                 },
                 "required": ["listing_id", "checkin", "checkout"]
             }
@@ -132,7 +139,8 @@ async def list_tools() -> list[types.Tool]:
                     "min_price": {"type": "number", "description": "Minimum price filter"},
                     "max_price": {"type": "number", "description": "Maximum price filter"},
                     "min_rating": {"type": "number", "description": "Minimum rating filter (e.g., 4.5)"},
-                    "sort_by": {"type": "string", "description": "Sort by: 'price', 'rating', or 'value' (default: value)"}
+                    "sort_by": {"type": "string", "description": "Sort by: 'price', 'rating', or 'value' (default: value)"},
+                    "pretty": _PRETTY_ARG
                 },
                 "required": ["location"]
             }
@@ -151,10 +159,28 @@ async def list_tools() -> list[types.Tool]:
                     "checkin": {"type": "string", "description": "Check-in date (YYYY-MM-DD)"},
                     "checkout": {"type": "string", "description": "Check-out date (YYYY-MM-DD)"},
                     "adults": {"type": "number", "description": "Number of adults (default: 1)"},
-                    "children": {"type": "number", "description": "Number of children (default: 0)"}
+                    "children": {"type": "number", "description": "Number of children (default: 0)"},
+                    "pretty": _PRETTY_ARG
                 },
                 "required": ["listing_ids"]
             }
+        ),
+        types.Tool(
+            name="airbnb_search_with_details",
+            description="Search for listings and fetch full details for the top results in a single call",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "location": {"type": "string", "description": "Location to search (e.g., 'Goa, India')"},
+                    "checkin": {"type": "string", "description": "Check-in date (YYYY-MM-DD)"},
+                    "checkout": {"type": "string", "description": "Check-out date (YYYY-MM-DD)"},
+                    "adults": {"type": "number", "description": "Number of adults (default: 1)"},
+                    "children": {"type": "number", "description": "Number of children (default: 0)"},
+                    "top_k": {"type": "number", "description": "Number of top listings to fetch details for (1-10, default: 3)"},
+                    "pretty": _PRETTY_ARG
+                },
+                "required": ["location"]
+            }
         )
     ]
 
@@ -163,35 +189,29 @@ async def list_tools() -> list[types.Tool]:
 async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
     """Handle tool calls"""
     try:
-        if name == "airbnb_search":
-            result = await airbnb_search(**arguments)
-        elif name == "airbnb_listing_details":
-            result = await airbnb_listing_details(**arguments)
-        elif name == "airbnb_price_analyzer":
-            result = await airbnb_price_analyzer(**arguments)
-        elif name == "airbnb_trip_budget":
-            result = await airbnb_trip_budget(**arguments)
-        elif name == "airbnb_smart_filter":
-            result = await airbnb_smart_filter(**arguments)
-        elif name == "airbnb_compare_listings":
-            result = await airbnb_compare_listings(**arguments)
-        else:
+        handler = TOOL_HANDLERS.get(name)
+        if handler is None:
             raise ValueError(f"Unknown tool: {name}")
 
-        return [types.TextContent(type="text", text=result)]
+        pretty = arguments.pop("pretty", PRETTY_JSON)
+        result = await handler(**arguments)
+        return [types.TextContent(type="text", text=json_dumps(result, indent=2 if pretty else 0))]
     except Exception as e:
-        logger.error(f"Error calling tool {name}: {e}")
-        return [types.TextContent(type="text", text=json.dumps({"error": str(e)}))]
+        logger.error("Error calling tool %s: %s", name, e)
+        return [types.TextContent(type="text", text=json_dumps({"error": str(e)}))]
 
 
 async def main():
     """Main entry point"""
     logger.info("Starting Airbnb MCP Server")
-    logger.info("6 tools available: search, details, price_analyzer, trip_budget, smart_filter, compare_listings")
+    logger.info("7 tools available: search, details, price_analyzer, trip_budget, smart_filter, compare_listings, search_with_details")
 
     # Run the MCP server with stdio transport
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(read_stream, write_stream, app.create_initialization_options())
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(read_stream, write_stream, app.create_initialization_options())
+    finally:
+        await close_session()
 
 
 if __name__ == "__main__":
@@ -2,12 +2,25 @@
 Airbnb MCP Tools
 """
 
-from .search import airbnb_search
-from .listing_details import airbnb_listing_details
-from .price_analyzer import airbnb_price_analyzer
-from .trip_budget import airbnb_trip_budget
-from .smart_filter import airbnb_smart_filter
-from .compare_listings import airbnb_compare_listings
+from .search import airbnb_search, _airbnb_search
+from .listing_details import airbnb_listing_details, _airbnb_listing_details
+from .price_analyzer import airbnb_price_analyzer, _airbnb_price_analyzer
+from .trip_budget import airbnb_trip_budget, _airbnb_trip_budget
+from .smart_filter import airbnb_smart_filter, _airbnb_smart_filter
+from .compare_listings import airbnb_compare_listings, _airbnb_compare_listings
+from .search_with_details import airbnb_search_with_details, _airbnb_search_with_details
+
+# Dict-returning implementations keyed by MCP tool name; the server encodes
+# each result to JSON exactly once
+TOOL_HANDLERS = {
+    'airbnb_search': _airbnb_search,
+    'airbnb_listing_details': _airbnb_listing_details,
+    'airbnb_price_analyzer': _airbnb_price_analyzer,
+    'airbnb_trip_budget': _airbnb_trip_budget,
+    'airbnb_smart_filter': _airbnb_smart_filter,
+    'airbnb_compare_listings': _airbnb_compare_listings,
+    'airbnb_search_with_details': _airbnb_search_with_details,
+}
 
 __all__ = [
     'airbnb_search',
@@ -16,4 +29,6 @@ __all__ = [
     'airbnb_trip_budget',
     'airbnb_smart_filter',
     'airbnb_compare_listings',
+    'airbnb_search_with_details',
+    'TOOL_HANDLERS',
 ]
@@ -2,114 +2,139 @@
 Airbnb compare listings tool
 """
 
-import json
+import asyncio
 import logging
 import re
 from typing import List, Optional
 
-from .search import airbnb_search
-from .listing_details import airbnb_listing_details
+from utils import json_dumps
+from .listing_details import _airbnb_listing_details
 
 logger = logging.getLogger(__name__)
 
+# Compiled once; used for every listing. Commas are stripped from the match
+_PRICE_RE = re.compile(r'\d[\d,]*\.?\d*')
+
+# Listing detail pages fetched at once by one comparison, below the client's global cap
+_COMPARE_CONCURRENCY = 3
+
+
+async def _fetch_details(semaphore: asyncio.Semaphore, listing_id: str, checkin: Optional[str],
+                         checkout: Optional[str], adults: int, children: int) -> dict:
+    async with semaphore:
+        return await _airbnb_listing_details(listing_id, checkin, checkout, adults, children)
+
+
+def _build_comparison(listing_id: str, details: dict) -> dict:
+    """Build the comparison entry for one listing from its details"""
+    # Extract key comparison data
+    comparison = {
+        'listing_id': listing_id,
+        'url': details.get('listingUrl'),
+        'name': 'Unknown',
+        'price': None,
+        'rating': None,
+        'location': None,
+        'amenities': [],
+        'highlights': [],
+        'policies': {}
+    }
+
+    # Extract from details
+    for detail in details.get('details', []):
+        detail_id = detail.get('id')
+
+        if detail_id == 'TITLE_DEFAULT':
+            comparison['name'] = detail.get('title', 'Unknown')
+        elif detail_id == 'REVIEWS_DEFAULT':
+            rating = detail.get('overallRating')
+            if rating is not None:
+                count = detail.get('overallCount')
+                comparison['rating'] = f"{rating} ({count})" if count is not None else str(rating)
+        elif detail_id == 'BOOK_IT_SIDEBAR':
+            try:
+                price_info = detail['structuredDisplayPrice']['primaryLine']
+            except (KeyError, TypeError):
+                price_info = {}
+            comparison['price'] = price_info.get('discountedPrice') or price_info.get('price')
+        elif detail_id == 'LOCATION_DEFAULT':
+            comparison['location'] = {
+                'lat': detail.get('lat'),
+                'lng': detail.get('lng'),
+                'description': detail.get('title')
+            }
+        elif detail_id == 'AMENITIES_DEFAULT':
+            amenities_groups = detail.get('seeAllAmenitiesGroups', [])
+            if isinstance(amenities_groups, str):
+                comparison['amenities'] = [amenities_groups]
+            else:
+                comparison['amenities'] = amenities_groups
+        elif detail_id == 'HIGHLIGHTS_DEFAULT':
+            comparison['highlights'] = detail.get('highlights', [])
+        elif detail_id == 'POLICIES_DEFAULT':
+            comparison['policies'] = detail.get('houseRulesSections', {})
+
+    return comparison
+
 
 async def airbnb_compare_listings(listing_ids: List[str], checkin: Optional[str] = None,
                                   checkout: Optional[str] = None,
                                   adults: int = 1, children: int = 0) -> str:
     """Compare multiple listings side-by-side"""
+    return json_dumps(await _airbnb_compare_listings(listing_ids, checkin, checkout, adults, children))
+
+
+async def _airbnb_compare_listings(listing_ids: List[str], checkin: Optional[str] = None,
+                                   checkout: Optional[str] = None,
+                                   adults: int = 1, children: int = 0) -> dict:
+    """Compare multiple listings, returning the result as a dict"""
 
     if not listing_ids or len(listing_ids) < 2:
-        return json.dumps({
+        return {
             'error': 'Please provide at least 2 listing IDs to compare',
             'format': 'listing_ids: ["id1", "id2", "id3"]'
-        }, indent=2)
+        }
 
     if len(listing_ids) > 5:
-        return json.dumps({
+        return {
             'error': 'Maximum 5 listings can be compared at once',
             'provided': len(listing_ids)
-        }, indent=2)
+        }
 
     try:
-        logger.info(f"Comparing {len(listing_ids)} listings")
-
-        comparisons = []
-
-        for listing_id in listing_ids:
-            # Get details for each listing
-            details_json = await airbnb_listing_details(listing_id, checkin, checkout, adults, children)
-            details = json.loads(details_json)
-
-            if 'error' in details:
-                logger.warning(f"Could not fetch details for {listing_id}: {details['error']}")
-                continue
-
-            # Also search to get pricing
-            search_json = await airbnb_search("India", checkin, checkout, adults, children, limit=50)
-            search = json.loads(search_json)
-
-            listing_info = None
-            for item in search.get('searchResults', []):
-                if item.get('id') == listing_id:
-                    listing_info = item
-                    break
-
-            # Extract key comparison data
-            comparison = {
-                'listing_id': listing_id,
-                'url': details.get('listingUrl'),
-                'name': 'Unknown',
-                'price': None,
-                'rating': None,
-                'location': None,
-                'amenities': [],
-                'highlights': [],
-                'policies': {}
-            }
-
-            if listing_info:
-                comparison['name'] = listing_info.get('title', 'Unknown')
-                comparison['rating'] = listing_info.get('avgRatingLocalized')
-
-                # Extract price
-                price_info = listing_info.get('structuredDisplayPrice', {}).get('primaryLine', {})
-                comparison['price'] = price_info.get('discountedPrice')
-
-            # Extract from details
-            for detail in details.get('details', []):
-                detail_id = detail.get('id')
-
-                if detail_id == 'LOCATION_DEFAULT':
-                    comparison['location'] = {
-                        'lat': detail.get('lat'),
-                        'lng': detail.get('lng'),
-                        'description': detail.get('title')
-                    }
-                elif detail_id == 'AMENITIES_DEFAULT':
-                    amenities_groups = detail.get('seeAllAmenitiesGroups', [])
-                    if isinstance(amenities_groups, str):
-                        comparison['amenities'] = [amenities_groups]
-                    else:
-                        comparison['amenities'] = amenities_groups
-                elif detail_id == 'HIGHLIGHTS_DEFAULT':
-                    comparison['highlights'] = detail.get('highlights', [])
-                elif detail_id == 'POLICIES_DEFAULT':
-                    comparison['policies'] = detail.get('houseRulesSections', {})
-
-            comparisons.append(comparison)
+        logger.info("Comparing %d listings", len(listing_ids))
+
+        # Fetch each distinct listing once, concurrently; duplicates reuse the result
+        unique_ids = list(dict.fromkeys(listing_ids))
+        semaphore = asyncio.Semaphore(_COMPARE_CONCURRENCY)
+        results = await asyncio.gather(*(_fetch_details(semaphore, listing_id, checkin, checkout, adults, children)
+                                         for listing_id in unique_ids), return_exceptions=True)
+
+        # One failing listing shouldn't sink the comparison; treat it as unfetched
+        by_id = {}
+        for listing_id, details in zip(unique_ids, results):
+            if isinstance(details, Exception):
+                logger.warning("Error comparing listing %s: %s", listing_id, details)
+                by_id[listing_id] = None
+            elif 'error' in details:
+                logger.warning("Could not fetch details for %s: %s", listing_id, details['error'])
+                by_id[listing_id] = None
+            else:
+                by_id[listing_id] = _build_comparison(listing_id, details)
+        comparisons = [by_id[listing_id] for listing_id in listing_ids if by_id[listing_id] is not None]
 
         if len(comparisons) < 2:
-            return json.dumps({
+            return {
                 'error': 'Could not fetch enough listings to compare',
                 'fetched': len(comparisons),
                 'requested': len(listing_ids)
-            }, indent=2)
+            }
 
         # Calculate comparison insights
         prices = []
         for comp in comparisons:
             if comp['price']:
-                price_match = re.search(r'[\d,]+', comp['price'].replace(',', ''))
+                price_match = _PRICE_RE.search(comp['price'])
                 if price_match:
                     prices.append({
                         'id': comp['listing_id'],
@@ -126,20 +151,18 @@ async def airbnb_compare_listings(listing_ids: List[str], checkin: Optional[str]
                 'price_difference': round(most_expensive['value'] - cheapest['value'], 2)
             }
 
-        logger.info(f"Successfully compared {len(comparisons)} listings")
+        logger.info("Successfully compared %d listings", len(comparisons))
 
-        return json.dumps({
+        return {
             'comparison_date': checkin if checkin else 'Not specified',
             'guests': {'adults': adults, 'children': children},
             'listings_compared': len(comparisons),
             'comparisons': comparisons,
             'insights': insights
-        }, indent=2)
+        }
 
     except Exception as e:
-        logger.error(f"Listing comparison failed: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return json.dumps({
+        logger.exception("Listing comparison failed: %s", e)
+        return {
             'error': str(e)
-        }, indent=2)
+        }
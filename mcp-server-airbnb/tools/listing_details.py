@@ -2,23 +2,30 @@
 Airbnb listing details tool
 """
 
-import json
+import asyncio
 import logging
 from typing import Optional
 from urllib.parse import urlencode
-from bs4 import BeautifulSoup
 
 from config import BASE_URL
-from utils import fetch_with_user_agent, clean_object, pick_by_schema, flatten_arrays_in_object, get_listing_details_schema
+from utils import (fetch_with_validators, compile_schema, extract_by_schema,
+                   extract_deferred_state, get_listing_details_schema, json_dumps, TTLCache)
 
 logger = logging.getLogger(__name__)
 
+# Section schemas are static, so compile them once at import
+_SECTION_SCHEMAS = {section_id: compile_schema(schema)
+                    for section_id, schema in get_listing_details_schema().items()}
 
-async def airbnb_listing_details(id: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
-                                 adults: int = 1, children: int = 0) -> str:
-    """Get detailed information about a specific Airbnb listing"""
+# Parsed details keyed by listing URL; compare and budget tools frequently
+# ask for the same listing again within a conversation. Values are
+# (validators, result) so an expired entry can be revalidated
+_CACHE = TTLCache(maxsize=256, ttl=600)
 
-    # Build listing URL
+
+def _build_listing_url(id: str, checkin: Optional[str], checkout: Optional[str],
+                       adults: int, children: int) -> str:
+    """Build the listing page URL for the given stay"""
     listing_url = f"{BASE_URL}/rooms/{id}?"
 
     params = {}
@@ -31,83 +38,100 @@ async def airbnb_listing_details(id: str, checkin: Optional[str] = None, checkou
     if children:
         params["children"] = str(children)
 
-    full_url = listing_url + urlencode(params)
-
-    try:
-        logger.info(f"Fetching listing details for ID: {id}")
-
-        # Fetch HTML
-        html = await fetch_with_user_agent(full_url)
-        logger.info(f"Got HTML response, length: {len(html)} chars")
-
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Find the data script element
-        script_elem = soup.find('script', {'id': 'data-deferred-state-0'})
-
-        if not script_elem:
-            logger.error("Could not find #data-deferred-state-0 script element")
-            raise Exception("Could not find data script element - page structure may have changed")
+    return listing_url + urlencode(params)
 
-        logger.info("Found data script element")
 
-        # Parse JSON from script content
-        script_content = script_elem.string
-        if not script_content:
-            raise Exception("Data script element is empty")
+def _copy_result(result: dict) -> dict:
+    """Copy the result and its section list so callers can't change the cached one"""
+    return {**result, 'details': list(result['details'])}
 
-        logger.info(f"Script content length: {len(script_content)} chars")
 
-        # Parse JSON
-        data = json.loads(script_content)
-
-        if 'niobeClientData' not in data:
-            logger.error(f"No niobeClientData in parsed JSON. Keys: {list(data.keys())}")
-            raise Exception("Unexpected data structure - niobeClientData not found")
-
-        client_data = data['niobeClientData'][0][1]
-
-        # Navigate to listing details sections
-        try:
-            sections_data = client_data['data']['presentation']['stayProductDetailPage']['sections']['sections']
-        except KeyError as e:
-            logger.error(f"Could not find sections in data structure: {e}")
-            raise Exception(f"Listing details not found - may be unavailable or structure changed")
-
-        # Clean sections
-        for section in sections_data:
-            clean_object(section)
+async def airbnb_listing_details(id: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
+                                 adults: int = 1, children: int = 0) -> str:
+    """Get detailed information about a specific Airbnb listing"""
+    return json_dumps(await _airbnb_listing_details(id, checkin, checkout, adults, children))
 
-        # Get schema
-        allow_section_schema = get_listing_details_schema()
 
-        # Filter and process sections based on schema
-        details = []
-        for section in sections_data:
-            section_id = section.get('sectionId', '')
-            if section_id in allow_section_schema:
-                section_content = section.get('section', {})
-                filtered_section = pick_by_schema(section_content, allow_section_schema[section_id])
-                flattened_section = flatten_arrays_in_object(filtered_section)
+def _parse_details_html(html: bytes, id: str, full_url: str) -> dict:
+    """Extract the schema'd sections from a listing page (synchronous, CPU-bound)"""
 
-                details.append({
-                    'id': section_id,
-                    **flattened_section
-                })
+    client_data = extract_deferred_state(html)
 
-        logger.info(f"Successfully extracted {len(details)} detail sections")
+    # Navigate to listing details sections
+    try:
+        sections_data = client_data['data']['presentation']['stayProductDetailPage']['sections']['sections']
+    except KeyError as e:
+        logger.error("Could not find sections in data structure: %s", e)
+        raise Exception(f"Listing details not found - may be unavailable or structure changed")
+
+    # Filter and process sections based on schema
+    details = []
+    for section in sections_data:
+        section_id = section.get('sectionId', '')
+        section_schema = _SECTION_SCHEMAS.get(section_id)
+        if section_schema is not None:
+            section_content = section.get('section', {})
+            # Clean, filter and flatten in a single pass over the raw section
+            flattened_section = extract_by_schema(section_content, section_schema)
+
+            details.append({
+                'id': section_id,
+                **flattened_section
+            })
+
+    logger.info("Successfully extracted %d detail sections", len(details))
+
+    return {
+        'listingUrl': full_url,
+        'listingId': id,
+        'details': details
+    }
+
+
+async def _airbnb_listing_details(id: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
+                                  adults: int = 1, children: int = 0) -> dict:
+    """Get detailed information about a specific Airbnb listing as a dict"""
+
+    full_url = _build_listing_url(id, checkin, checkout, adults, children)
+
+    cached = _CACHE.get(full_url)
+    if cached is not None:
+        logger.info("Listing details cache hit for ID: %s", id)
+        return _copy_result(cached[1])
 
-        return json.dumps({
-            'listingUrl': full_url,
-            'listingId': id,
-            'details': details
-        }, indent=2)
+    try:
+        # Concurrent requests for the same listing wait for the first one
+        async with _CACHE.lock(full_url):
+            cached = _CACHE.get(full_url)
+            if cached is not None:
+                return _copy_result(cached[1])
+
+            # An expired entry still has the page's ETag/Last-Modified; if the
+            # page is unchanged (304) its parsed result is reused as is
+            stale = _CACHE.get_stale(full_url)
+            validators = stale[0] if stale is not None else (None, None)
+
+            logger.info("Fetching listing details for ID: %s", id)
+
+            # Fetch HTML as bytes; orjson parses the script payload without a decode
+            html, validators = await fetch_with_validators(full_url, validators)
+            if html is None:
+                logger.info("Listing page not modified, reusing parsed details for ID: %s", id)
+                result = stale[1]
+            else:
+                logger.info("Got HTML response, length: %d bytes", len(html))
+
+                # Parsing is CPU-bound; run it in a worker thread so the event loop
+                # keeps servicing the other detail fetches a comparison gathers
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(None, _parse_details_html, html, id, full_url)
+            _CACHE.set(full_url, (validators, result))
+            return _copy_result(result)
 
     except Exception as e:
-        logger.error(f"Listing details fetch failed: {e}")
-        return json.dumps({
+        logger.error("Listing details fetch failed: %s", e)
+        return {
             'error': str(e),
             'listingUrl': full_url,
             'listingId': id
-        }, indent=2)
+        }
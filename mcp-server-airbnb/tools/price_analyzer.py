@@ -2,16 +2,119 @@
 Airbnb price analyzer tool
 """
 
-import json
+import asyncio
 import logging
 import re
 from typing import Optional, List
-from datetime import datetime
 
-from .search import airbnb_search
+from utils import json_dumps, parse_date
+from .search import _airbnb_search
 
 logger = logging.getLogger(__name__)
 
+# Compiled once; used for every listing
+_PRICE_RE = re.compile(r'\d[\d,]*')
+
+
+async def _analyze_date_range(location: str, adults: int, children: int,
+                              idx: int, date_range: dict) -> Optional[dict]:
+    """Search one date range and summarize its prices (None if unusable)"""
+    checkin = date_range.get('checkin')
+    checkout = date_range.get('checkout')
+
+    if not checkin or not checkout:
+        logger.warning("Skipping date range %d: missing checkin or checkout", idx)
+        return None
+
+    # Perform search for this date range; the HTTP client caps concurrent requests
+    result = await _airbnb_search(location, checkin, checkout, adults, children, limit=20)
+
+    if 'error' in result:
+        logger.warning("Error for date range %s to %s: %s", checkin, checkout, result['error'])
+        return None
+
+    # Calculate date range details
+    checkin_date = parse_date(checkin)
+    checkout_date = parse_date(checkout)
+    nights = (checkout_date - checkin_date).days
+
+    # Extract prices, accumulating the stats in the same pass
+    listings = result.get('searchResults', [])
+    count = 0
+    sum_total = sum_per_night = sum_discount = 0.0
+    min_price = max_price = None
+
+    for listing in listings:
+        try:
+            price_info = listing['structuredDisplayPrice']['primaryLine']
+        except (KeyError, TypeError):
+            price_info = {}
+        discounted_price = price_info.get('discountedPrice', '')
+        original_price = price_info.get('originalPrice', '')
+
+        # Extract numeric price
+        if discounted_price:
+            price_match = _PRICE_RE.search(discounted_price)
+            if price_match:
+                total_price = float(price_match.group().replace(',', ''))
+                per_night = total_price / nights if nights > 0 else total_price
+
+                discount_pct = 0
+                if original_price:
+                    orig_match = _PRICE_RE.search(original_price)
+                    if orig_match:
+                        orig_total = float(orig_match.group().replace(',', ''))
+                        discount_pct = ((orig_total - total_price) / orig_total * 100) if orig_total > 0 else 0
+
+                price = {
+                    'total': total_price,
+                    'per_night': per_night,
+                    'listing_id': listing.get('id'),
+                    'name': listing.get('title', 'Unknown')
+                }
+                count += 1
+                sum_total += total_price
+                sum_per_night += per_night
+                sum_discount += round(discount_pct, 1)
+                # Strict comparisons keep the first listing on ties, like min()/max()
+                if min_price is None or total_price < min_price['total']:
+                    min_price = price
+                if max_price is None or total_price > max_price['total']:
+                    max_price = price
+
+    if count:
+        avg_total = sum_total / count
+        avg_per_night = sum_per_night / count
+        avg_discount = sum_discount / count
+
+        return {
+            'checkin': checkin,
+            'checkout': checkout,
+            'nights': nights,
+            'listings_found': count,
+            'average_total_price': round(avg_total, 2),
+            'average_per_night': round(avg_per_night, 2),
+            'cheapest': {
+                'total': min_price['total'],
+                'per_night': round(min_price['per_night'], 2),
+                'listing_id': min_price['listing_id'],
+                'name': min_price['name']
+            },
+            'most_expensive': {
+                'total': max_price['total'],
+                'per_night': round(max_price['per_night'], 2),
+                'listing_id': max_price['listing_id'],
+                'name': max_price['name']
+            },
+            'average_discount_percent': round(avg_discount, 1),
+            'price_range': {
+                'min': min_price['total'],
+                'max': max_price['total']
+            }
+        }
+
+    return None
+
 
 async def airbnb_price_analyzer(location: str, adults: int = 1, children: int = 0,
                                 date_ranges: Optional[List[dict]] = None) -> str:
@@ -19,117 +122,47 @@ async def airbnb_price_analyzer(location: str, adults: int = 1, children: int =
     Analyze and compare prices across different dates for the same location
     date_ranges format: [{"checkin": "YYYY-MM-DD", "checkout": "YYYY-MM-DD"}, ...]
     """
+    return json_dumps(await _airbnb_price_analyzer(location, adults, children, date_ranges))
+
+
+async def _airbnb_price_analyzer(location: str, adults: int = 1, children: int = 0,
+                                 date_ranges: Optional[List[dict]] = None) -> dict:
+    """Dict-returning implementation of airbnb_price_analyzer"""
 
     if not date_ranges or len(date_ranges) == 0:
-        return json.dumps({
+        return {
             'error': 'Please provide at least one date range to analyze',
             'format': 'date_ranges: [{"checkin": "2025-10-05", "checkout": "2025-10-07"}]'
-        }, indent=2)
+        }
 
     try:
-        logger.info(f"Analyzing prices for {location} across {len(date_ranges)} date ranges")
+        logger.info("Analyzing prices for %s across %d date ranges", location, len(date_ranges))
 
-        all_results = []
+        tasks = [_analyze_date_range(location, adults, children, idx, date_range)
+                 for idx, date_range in enumerate(date_ranges)]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        for idx, date_range in enumerate(date_ranges):
-            checkin = date_range.get('checkin')
-            checkout = date_range.get('checkout')
-
-            if not checkin or not checkout:
-                logger.warning(f"Skipping date range {idx}: missing checkin or checkout")
-                continue
-
-            # Perform search for this date range
-            result_json = await airbnb_search(location, checkin, checkout, adults, children, limit=20)
-            result = json.loads(result_json)
-
-            if 'error' in result:
-                logger.warning(f"Error for date range {checkin} to {checkout}: {result['error']}")
-                continue
-
-            # Calculate date range details
-            checkin_date = datetime.strptime(checkin, '%Y-%m-%d')
-            checkout_date = datetime.strptime(checkout, '%Y-%m-%d')
-            nights = (checkout_date - checkin_date).days
-
-            # Extract prices
-            listings = result.get('searchResults', [])
-            prices = []
-
-            for listing in listings:
-                price_info = listing.get('structuredDisplayPrice', {}).get('primaryLine', {})
-                discounted_price = price_info.get('discountedPrice', '')
-                original_price = price_info.get('originalPrice', '')
-
-                # Extract numeric price
-                if discounted_price:
-                    price_match = re.search(r'[\d,]+', discounted_price.replace(',', ''))
-                    if price_match:
-                        total_price = float(price_match.group().replace(',', ''))
-                        per_night = total_price / nights if nights > 0 else total_price
-
-                        discount_pct = 0
-                        if original_price:
-                            orig_match = re.search(r'[\d,]+', original_price.replace(',', ''))
-                            if orig_match:
-                                orig_total = float(orig_match.group().replace(',', ''))
-                                discount_pct = ((orig_total - total_price) / orig_total * 100) if orig_total > 0 else 0
-
-                        prices.append({
-                            'total': total_price,
-                            'per_night': per_night,
-                            'discount_percent': round(discount_pct, 1),
-                            'listing_id': listing.get('id'),
-                            'name': listing.get('title', 'Unknown')
-                        })
-
-            if prices:
-                avg_total = sum(p['total'] for p in prices) / len(prices)
-                avg_per_night = sum(p['per_night'] for p in prices) / len(prices)
-                min_price = min(prices, key=lambda x: x['total'])
-                max_price = max(prices, key=lambda x: x['total'])
-                avg_discount = sum(p['discount_percent'] for p in prices) / len(prices)
-
-                all_results.append({
-                    'checkin': checkin,
-                    'checkout': checkout,
-                    'nights': nights,
-                    'listings_found': len(prices),
-                    'average_total_price': round(avg_total, 2),
-                    'average_per_night': round(avg_per_night, 2),
-                    'cheapest': {
-                        'total': min_price['total'],
-                        'per_night': round(min_price['per_night'], 2),
-                        'listing_id': min_price['listing_id'],
-                        'name': min_price['name']
-                    },
-                    'most_expensive': {
-                        'total': max_price['total'],
-                        'per_night': round(max_price['per_night'], 2),
-                        'listing_id': max_price['listing_id'],
-                        'name': max_price['name']
-                    },
-                    'average_discount_percent': round(avg_discount, 1),
-                    'price_range': {
-                        'min': min_price['total'],
-                        'max': max_price['total']
-                    }
-                })
+        all_results = []
+        for date_range, result in zip(date_ranges, results):
+            if isinstance(result, Exception):
+                logger.warning("Error for date range %s: %s", date_range, result)
+            elif result is not None:
+                all_results.append(result)
 
         if not all_results:
-            return json.dumps({
+            return {
                 'error': 'No price data found for any date ranges',
                 'location': location
-            }, indent=2)
+            }
 
         # Find best value dates
         best_value = min(all_results, key=lambda x: x['average_per_night'])
         cheapest_total = min(all_results, key=lambda x: x['cheapest']['total'])
         highest_discount = max(all_results, key=lambda x: x['average_discount_percent'])
 
-        logger.info(f"Price analysis complete for {len(all_results)} date ranges")
+        logger.info("Price analysis complete for %d date ranges", len(all_results))
 
-        return json.dumps({
+        return {
             'location': location,
             'adults': adults,
             'children': children,
@@ -155,13 +188,11 @@ async def airbnb_price_analyzer(location: str, adults: int = 1, children: int =
                     'reason': 'Highest average discount percentage'
                 }
             }
-        }, indent=2)
+        }
 
     except Exception as e:
-        logger.error(f"Price analyzer failed: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return json.dumps({
+        logger.exception("Price analyzer failed: %s", e)
+        return {
             'error': str(e),
             'location': location
-        }, indent=2)
+        }
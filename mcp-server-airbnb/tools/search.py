@@ -2,140 +2,173 @@
 Airbnb search tool
 """
 
-import json
+import asyncio
 import base64
+import binascii
 import logging
+from functools import lru_cache
 from typing import Optional
-from urllib.parse import quote, urlencode
-from bs4 import BeautifulSoup
+from urllib.parse import quote, quote_plus
 
 from config import BASE_URL
-from utils import fetch_with_user_agent, clean_object, pick_by_schema, flatten_arrays_in_object, get_search_result_schema
+from utils import (fetch_with_validators, clean_object, compile_schema, extract_by_schema,
+                   extract_deferred_state, get_search_result_schema, json_dumps, TTLCache)
 
 logger = logging.getLogger(__name__)
 
+# The result schema is static, so compile it once at import
+_SEARCH_SCHEMA = compile_schema(get_search_result_schema())
 
-async def airbnb_search(location: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
-                       adults: int = 1, children: int = 0, limit: int = 10) -> str:
-    """Search for Airbnb listings using simple HTTP fetch"""
+# Recent search results keyed by normalized arguments; tools like smart_filter
+# and price_analyzer often repeat the same search within a conversation.
+# Values are (validators, result) so an expired entry can be revalidated
+_CACHE = TTLCache(maxsize=256, ttl=120)
 
-    # Build search URL
-    search_url = f"{BASE_URL}/s/{quote(location)}/homes?"
 
-    params = {}
+@lru_cache(maxsize=4096)
+def _decode_listing_id(encoded: str) -> str:
+    """Decode a base64 'StayListing:<id>' value; the same ids recur across searches"""
+    try:
+        raw = base64.b64decode(encoded)
+        # Only the part after the type prefix is needed, so only that is decoded
+        i = raw.find(b':')
+        listing_id = raw[i + 1:].decode('utf-8') if i >= 0 else ''
+    except (binascii.Error, UnicodeDecodeError) as e:
+        logger.warning("Failed to decode listing ID: %s", e)
+        return encoded
+    return listing_id or encoded
+
+
+def _build_search_url(location: str, checkin: Optional[str], checkout: Optional[str],
+                      adults: int, children: int) -> str:
+    """Build the search URL directly; only the free-text fields need quoting"""
+    query = []
     if checkin:
-        params["checkin"] = checkin
+        query.append(f"checkin={quote_plus(checkin)}")
     if checkout:
-        params["checkout"] = checkout
+        query.append(f"checkout={quote_plus(checkout)}")
     if adults:
-        params["adults"] = str(adults)
+        query.append(f"adults={adults}")
     if children:
-        params["children"] = str(children)
+        query.append(f"children={children}")
+    return f"{BASE_URL}/s/{quote(location)}/homes?" + "&".join(query)
 
-    full_url = search_url + urlencode(params)
 
-    try:
-        logger.info(f"Fetching {full_url}")
-
-        # Fetch HTML
-        html = await fetch_with_user_agent(full_url)
-        logger.info(f"Got HTML response, length: {len(html)} chars")
-
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Find the data script element
-        script_elem = soup.find('script', {'id': 'data-deferred-state-0'})
-
-        if not script_elem:
-            logger.error("Could not find #data-deferred-state-0 script element")
-            raise Exception("Could not find data script element - page structure may have changed")
-
-        logger.info("Found data script element")
-
-        # Parse JSON from script content
-        script_content = script_elem.string
-        if not script_content:
-            raise Exception("Data script element is empty")
-
-        logger.info(f"Script content length: {len(script_content)} chars")
-
-        # Parse JSON
-        data = json.loads(script_content)
-
-        if 'niobeClientData' not in data:
-            logger.error(f"No niobeClientData in parsed JSON. Keys: {list(data.keys())}")
-            raise Exception("Unexpected data structure - niobeClientData not found")
-
-        client_data = data['niobeClientData'][0][1]
-        results = client_data['data']['presentation']['staysSearch']['results']
-
-        # Clean results
-        clean_object(results)
-
-        # Extract and process search results
-        search_results = results.get('searchResults', [])
-        logger.info(f"Found {len(search_results)} raw search results")
-
-        # Get schema
-        allow_search_result_schema = get_search_result_schema()
-
-        listings = []
-        for idx, result in enumerate(search_results[:limit]):
-            try:
-                # Extract listing data from demandStayListing field
-                demand_stay_listing = result.get('demandStayListing', {})
-                if not demand_stay_listing:
-                    logger.warning(f"Result {idx}: No 'demandStayListing' field found")
-                    continue
-
-                listing_id_encoded = demand_stay_listing.get('id', '')
-                if not listing_id_encoded:
-                    logger.warning(f"Result {idx}: No 'id' in demandStayListing")
-                    continue
-
-                # Decode listing ID (base64 encoded)
-                try:
-                    decoded = base64.b64decode(listing_id_encoded).decode('utf-8')
-                    listing_id = decoded.split(':')[1] if ':' in decoded else listing_id_encoded
-                except Exception as e:
-                    logger.warning(f"Failed to decode listing ID: {e}")
-                    listing_id = listing_id_encoded
-
-                # Apply schema filtering
-                filtered_result = pick_by_schema(result, allow_search_result_schema)
-                flattened_result = flatten_arrays_in_object(filtered_result)
-
-                # Build listing object with all extracted data
-                listing = {
-                    'id': listing_id,
-                    'url': f"{BASE_URL}/rooms/{listing_id}",
-                    **flattened_result
-                }
-
-                listings.append(listing)
-                logger.info(f"Successfully extracted listing {idx}: {listing_id}")
-
-            except Exception as e:
-                logger.warning(f"Error parsing listing {idx}: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
+def _copy_result(result: dict) -> dict:
+    """Copy the result and its listing list so callers can't change the cached one"""
+    return {**result, 'searchResults': list(result['searchResults'])}
+
+
+async def airbnb_search(location: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
+                       adults: int = 1, children: int = 0, limit: int = 10) -> str:
+    """Search for Airbnb listings using simple HTTP fetch"""
+    return json_dumps(await _airbnb_search(location, checkin, checkout, adults, children, limit))
+
+
+def _parse_search_html(html: bytes, limit: int, full_url: str) -> dict:
+    """Extract listings from a search results page (synchronous, CPU-bound)"""
+
+    client_data = extract_deferred_state(html)
+    results = client_data['data']['presentation']['staysSearch']['results']
+
+    # Extract and process search results (cleaned per listing below)
+    search_results = results.get('searchResults') or []
+    logger.info("Found %d raw search results", len(search_results))
+
+    listings = []
+    for idx, result in enumerate(search_results):
+        # Stop once enough listings are built; malformed results don't use up the limit
+        if len(listings) >= limit:
+            break
+        try:
+            # Extract listing data from demandStayListing field
+            demand_stay_listing = result.get('demandStayListing', {})
+            if not demand_stay_listing:
+                logger.warning("Result %d: No 'demandStayListing' field found", idx)
+                continue
+
+            listing_id_encoded = demand_stay_listing.get('id', '')
+            if not listing_id_encoded:
+                logger.warning("Result %d: No 'id' in demandStayListing", idx)
                 continue
 
-        logger.info(f"Successfully extracted {len(listings)} listings from {len(search_results)} raw results")
+            # Decode listing ID (base64 encoded)
+            listing_id = _decode_listing_id(listing_id_encoded)
+
+            # Clean, filter and flatten in a single pass over the raw result
+            flattened_result = extract_by_schema(result, _SEARCH_SCHEMA)
+
+            # Build listing object with all extracted data
+            listing = {
+                'id': listing_id,
+                'url': f"{BASE_URL}/rooms/{listing_id}",
+                **flattened_result
+            }
+
+            listings.append(listing)
+            logger.info("Successfully extracted listing %d: %s", idx, listing_id)
+
+        except Exception as e:
+            logger.warning("Error parsing listing %d: %s", idx, e, exc_info=True)
+            continue
 
-        # Include pagination info if available
-        pagination_info = results.get('paginationInfo', {})
+    logger.info("Successfully extracted %d listings from %d raw results", len(listings), len(search_results))
 
-        return json.dumps({
-            'searchUrl': full_url,
-            'searchResults': listings,
-            'paginationInfo': pagination_info
-        }, indent=2)
+    # Include pagination info if available
+    pagination_info = clean_object(results.get('paginationInfo') or {})
+
+    return {
+        'searchUrl': full_url,
+        'searchResults': listings,
+        'paginationInfo': pagination_info
+    }
+
+
+async def _airbnb_search(location: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
+                         adults: int = 1, children: int = 0, limit: int = 10) -> dict:
+    """Search for Airbnb listings, returning the result as a dict for other tools"""
+
+    key = (location.strip().lower(), checkin, checkout, adults, children, limit)
+    cached = _CACHE.get(key)
+    if cached is not None:
+        logger.info("Search cache hit for %s", location)
+        return _copy_result(cached[1])
+
+    full_url = _build_search_url(location, checkin, checkout, adults, children)
+
+    try:
+        # Identical searches arriving together wait for the first one and
+        # reuse its result instead of parsing the same page again
+        async with _CACHE.lock(key):
+            cached = _CACHE.get(key)
+            if cached is not None:
+                return _copy_result(cached[1])
+
+            # An expired entry still has the page's ETag/Last-Modified; if the
+            # page is unchanged (304) its parsed result is reused as is
+            stale = _CACHE.get_stale(key)
+            validators = stale[0] if stale is not None else (None, None)
+
+            logger.info("Fetching %s", full_url)
+
+            # Fetch HTML as bytes; orjson parses the script payload without a decode
+            html, validators = await fetch_with_validators(full_url, validators)
+            if html is None:
+                logger.info("Search page not modified, reusing parsed result")
+                result = stale[1]
+            else:
+                logger.info("Got HTML response, length: %d bytes", len(html))
+
+                # Parsing is CPU-bound; run it in a worker thread so the event loop
+                # keeps servicing other in-flight searches meanwhile
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(None, _parse_search_html, html, limit, full_url)
+            _CACHE.set(key, (validators, result))
+            return _copy_result(result)
 
     except Exception as e:
-        logger.error(f"Search failed: {e}")
-        return json.dumps({
+        logger.error("Search failed: %s", e)
+        return {
             'error': str(e),
             'searchUrl': full_url
-        }, indent=2)
+        }
@@ -0,0 +1,56 @@
+"""
+Airbnb search with listing details tool
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from utils import json_dumps
+from .search import _airbnb_search
+from .listing_details import _airbnb_listing_details
+
+logger = logging.getLogger(__name__)
+
+# Detail pages fetched at once by one call, below the client's global cap
+_DETAILS_CONCURRENCY = 5
+
+
+async def airbnb_search_with_details(location: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
+                                     adults: int = 1, children: int = 0, top_k: int = 3) -> str:
+    """Search for listings and fetch details for the top results in one call"""
+    return json_dumps(await _airbnb_search_with_details(location, checkin, checkout, adults, children, top_k))
+
+
+async def _fetch_details(semaphore: asyncio.Semaphore, listing_id: str, checkin: Optional[str],
+                         checkout: Optional[str], adults: int, children: int) -> dict:
+    async with semaphore:
+        return await _airbnb_listing_details(listing_id, checkin, checkout, adults, children)
+
+
+async def _airbnb_search_with_details(location: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
+                                      adults: int = 1, children: int = 0, top_k: int = 3) -> dict:
+    """Dict-returning implementation of airbnb_search_with_details"""
+
+    top_k = max(1, min(int(top_k), 10))
+
+    search = await _airbnb_search(location, checkin, checkout, adults, children, limit=top_k)
+    if 'error' in search:
+        return search
+
+    listings = search['searchResults']
+    logger.info("Fetching details for the top %d listings in %s", len(listings), location)
+
+    # Detail pages are independent, so fetch them concurrently
+    semaphore = asyncio.Semaphore(_DETAILS_CONCURRENCY)
+    details = await asyncio.gather(*(_fetch_details(semaphore, listing['id'], checkin, checkout, adults, children)
+                                     for listing in listings))
+
+    enriched = []
+    for listing, detail in zip(listings, details):
+        listing = {**listing, 'details': detail.get('details', [])}
+        if 'error' in detail:
+            listing['detailsError'] = detail['error']
+        enriched.append(listing)
+
+    return {**search, 'searchResults': enriched}
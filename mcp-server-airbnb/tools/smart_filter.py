@@ -2,15 +2,19 @@
 Airbnb smart filter tool
 """
 
-import json
 import logging
 import re
 from typing import Optional
 
-from .search import airbnb_search
+from utils import json_dumps
+from .search import _airbnb_search
 
 logger = logging.getLogger(__name__)
 
+# Compiled once; these run for every listing
+_PRICE_RE = re.compile(r'\d[\d,]*')
+_RATING_RE = re.compile(r'[\d.]+')
+
 
 async def airbnb_smart_filter(location: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
                               adults: int = 1, children: int = 0,
@@ -21,37 +25,50 @@ async def airbnb_smart_filter(location: str, checkin: Optional[str] = None, chec
     Smart filtered search with sorting
     sort_by options: 'price' (low to high), 'rating' (high to low), 'value' (rating/price ratio)
     """
+    return json_dumps(await _airbnb_smart_filter(location, checkin, checkout, adults, children,
+                                                min_price, max_price, min_rating, sort_by))
+
+
+async def _airbnb_smart_filter(location: str, checkin: Optional[str] = None, checkout: Optional[str] = None,
+                               adults: int = 1, children: int = 0,
+                               min_price: Optional[float] = None, max_price: Optional[float] = None,
+                               min_rating: Optional[float] = None,
+                               sort_by: str = "value") -> dict:
+    """Dict-returning implementation of airbnb_smart_filter"""
 
     try:
-        logger.info(f"Smart filter search for {location} with filters")
+        logger.info("Smart filter search for %s with filters", location)
 
         # Perform base search
-        result_json = await airbnb_search(location, checkin, checkout, adults, children, limit=50)
-        result = json.loads(result_json)
+        result = await _airbnb_search(location, checkin, checkout, adults, children, limit=50)
 
         if 'error' in result:
-            return result_json
+            return result
 
         listings = result.get('searchResults', [])
 
         if not listings:
-            return json.dumps({
+            return {
                 'error': 'No listings found for this location',
                 'location': location
-            }, indent=2)
+            }
 
         # Filter and score listings
         filtered_listings = []
+        sort_keys = []
 
         for listing in listings:
             # Extract price
-            price_info = listing.get('structuredDisplayPrice', {}).get('primaryLine', {})
+            try:
+                price_info = listing['structuredDisplayPrice']['primaryLine']
+            except (KeyError, TypeError):
+                price_info = {}
             price_str = price_info.get('discountedPrice', '')
 
             if not price_str:
                 continue
 
-            price_match = re.search(r'[\d,]+', price_str.replace(',', ''))
+            price_match = _PRICE_RE.search(price_str)
             if not price_match:
                 continue
 
@@ -61,9 +78,9 @@ async def airbnb_smart_filter(location: str, checkin: Optional[str] = None, chec
             rating_str = listing.get('avgRatingLocalized', '')
             rating = 0.0
             if rating_str:
-                rating_match = re.search(r'([\d.]+)', rating_str)
+                rating_match = _RATING_RE.search(rating_str)
                 if rating_match:
-                    rating = float(rating_match.group(1))
+                    rating = float(rating_match.group())
 
             # Apply filters
             if min_price and total_price < min_price:
@@ -76,30 +93,22 @@ async def airbnb_smart_filter(location: str, checkin: Optional[str] = None, chec
             # Calculate value score (higher is better)
             value_score = (rating / (total_price / 1000)) if total_price > 0 else 0
 
-            filtered_listings.append({
-                **listing,
-                '_price_numeric': total_price,
-                '_rating_numeric': rating,
-                '_value_score': value_score
-            })
+            filtered_listings.append(listing)
+            sort_keys.append((total_price, rating, value_score))
 
-        # Sort listings
+        # Sort indices by the scores collected above rather than copying
+        # each listing to carry them
+        order = range(len(filtered_listings))
         if sort_by == "price":
-            filtered_listings.sort(key=lambda x: x['_price_numeric'])
+            order = sorted(order, key=lambda i: sort_keys[i][0])
         elif sort_by == "rating":
-            filtered_listings.sort(key=lambda x: x['_rating_numeric'], reverse=True)
+            order = sorted(order, key=lambda i: sort_keys[i][1], reverse=True)
         elif sort_by == "value":
-            filtered_listings.sort(key=lambda x: x['_value_score'], reverse=True)
-
-        # Remove internal fields before returning
-        for listing in filtered_listings:
-            listing.pop('_price_numeric', None)
-            listing.pop('_rating_numeric', None)
-            listing.pop('_value_score', None)
+            order = sorted(order, key=lambda i: sort_keys[i][2], reverse=True)
 
-        logger.info(f"Found {len(filtered_listings)} listings matching filters")
+        logger.info("Found %d listings matching filters", len(filtered_listings))
 
-        return json.dumps({
+        return {
             'searchUrl': result.get('searchUrl'),
             'filters_applied': {
                 'min_price': min_price,
@@ -108,15 +117,13 @@ async def airbnb_smart_filter(location: str, checkin: Optional[str] = None, chec
                 'sort_by': sort_by
             },
             'total_found': len(filtered_listings),
-            'searchResults': filtered_listings[:20],  # Limit to top 20
+            'searchResults': [filtered_listings[i] for i in order[:20]],  # Limit to top 20
             'paginationInfo': result.get('paginationInfo', {})
-        }, indent=2)
+        }
 
     except Exception as e:
-        logger.error(f"Smart filter search failed: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return json.dumps({
+        logger.exception("Smart filter search failed: %s", e)
+        return {
             'error': str(e),
             'location': location
-        }, indent=2)
+        }
@@ -2,30 +2,66 @@
 Airbnb trip budget calculator tool
 """
 
-import json
+import heapq
 import logging
 import re
+from functools import lru_cache
+from operator import itemgetter
 from typing import Optional
-from datetime import datetime
 
-from .search import airbnb_search
-from .listing_details import airbnb_listing_details
+from utils import json_dumps, parse_date
+from .search import _airbnb_search
+from .listing_details import _build_listing_url
 
 logger = logging.getLogger(__name__)
 
+# Airbnb fees (typical percentages) and a common tax rate
+_SERVICE_FEE_RATE = 0.14  # ~14% service fee
+_TAX_RATE = 0.12  # ~12% GST in India
+_CLEANING_FEE_NIGHT_FRACTION = 0.3  # Typically 30% of one night
+
+# Compiled once; used for the listing and every alternative
+_PRICE_RE = re.compile(r'\d[\d,]*')
+
+
+@lru_cache(maxsize=1024)
+def _parse_price(price_str: str) -> float:
+    """First number in a formatted price (0.0 if none); the same prices recur across results"""
+    match = _PRICE_RE.search(price_str)
+    return float(match.group().replace(',', '')) if match else 0.0
+
 
 async def airbnb_trip_budget(listing_id: str, checkin: str, checkout: str,
                              adults: int = 1, children: int = 0,
                              currency: str = "INR") -> str:
     """Calculate comprehensive trip budget including all fees and taxes"""
+    return json_dumps(await _airbnb_trip_budget(listing_id, checkin, checkout, adults, children, currency))
+
+
+async def _airbnb_trip_budget(listing_id: str, checkin: str, checkout: str,
+                              adults: int = 1, children: int = 0,
+                              currency: str = "INR") -> dict:
+    """Calculate the trip budget, returning the result as a dict"""
 
     try:
-        logger.info(f"Calculating trip budget for listing {listing_id}")
+        logger.info("Calculating trip budget for listing %s", listing_id)
+
+        # Validate the dates before any network requests
+        checkin_date = parse_date(checkin)
+        checkout_date = parse_date(checkout)
+        nights = (checkout_date - checkin_date).days
+
+        if nights <= 0:
+            return {
+                'error': 'Checkout date must be after checkin date',
+                'checkin': checkin,
+                'checkout': checkout
+            }
 
         # Fetch listing with dates to get accurate pricing
         search_location = "India"  # Fallback location
-        search_result_json = await airbnb_search(search_location, checkin, checkout, adults, children, limit=50)
-        search_result = json.loads(search_result_json)
+        # Parsed result from the search cache; repeat budget calls don't refetch or reparse
+        search_result = await _airbnb_search(search_location, checkin, checkout, adults, children, limit=50)
 
         # Find the specific listing in results
         listing = None
@@ -35,60 +71,42 @@ async def airbnb_trip_budget(listing_id: str, checkin: str, checkout: str,
                 break
 
         if not listing:
-            # Try to get details directly
-            details_json = await airbnb_listing_details(listing_id, checkin, checkout, adults, children)
-            details = json.loads(details_json)
-
-            return json.dumps({
+            return {
                 'error': 'Could not find pricing information for this listing',
                 'suggestion': 'Try searching for the location first, then use the listing ID from results',
                 'listing_id': listing_id,
-                'listing_url': details.get('listingUrl', f"https://www.airbnb.com/rooms/{listing_id}")
-            }, indent=2)
-
-        # Calculate nights
-        checkin_date = datetime.strptime(checkin, '%Y-%m-%d')
-        checkout_date = datetime.strptime(checkout, '%Y-%m-%d')
-        nights = (checkout_date - checkin_date).days
-
-        if nights <= 0:
-            return json.dumps({
-                'error': 'Checkout date must be after checkin date',
-                'checkin': checkin,
-                'checkout': checkout
-            }, indent=2)
+                # Same URL the listing details tool would fetch; no request needed
+                'listing_url': _build_listing_url(listing_id, checkin, checkout, adults, children)
+            }
 
         # Extract price information
-        price_info = listing.get('structuredDisplayPrice', {}).get('primaryLine', {})
+        try:
+            price_info = listing['structuredDisplayPrice']['primaryLine']
+        except (KeyError, TypeError):
+            price_info = {}
         discounted_price_str = price_info.get('discountedPrice', '')
         original_price_str = price_info.get('originalPrice', '')
 
         # Parse total accommodation cost
-        total_accommodation = 0
-        if discounted_price_str:
-            price_match = re.search(r'[\d,]+', discounted_price_str.replace(',', ''))
-            if price_match:
-                total_accommodation = float(price_match.group().replace(',', ''))
+        total_accommodation = _parse_price(discounted_price_str) if discounted_price_str else 0
 
         if total_accommodation == 0:
-            return json.dumps({
+            return {
                 'error': 'Could not extract pricing information',
                 'listing_id': listing_id
-            }, indent=2)
+            }
 
         # Calculate breakdown
         per_night_rate = total_accommodation / nights
 
-        # Airbnb fees (typical percentages)
-        service_fee_rate = 0.14  # ~14% service fee
-        service_fee = total_accommodation * service_fee_rate
+        # Airbnb fees
+        service_fee = total_accommodation * _SERVICE_FEE_RATE
 
         # Tax (varies by location, using common rate)
-        tax_rate = 0.12  # ~12% GST in India
-        tax_amount = total_accommodation * tax_rate
+        tax_amount = total_accommodation * _TAX_RATE
 
         # Optional: Cleaning fee (estimate)
-        cleaning_fee = per_night_rate * 0.3  # Typically 30% of one night
+        cleaning_fee = per_night_rate * _CLEANING_FEE_NIGHT_FRACTION
 
         # Total cost
         total_before_fees = total_accommodation
@@ -103,44 +121,45 @@ async def airbnb_trip_budget(listing_id: str, checkin: str, checkout: str,
         savings = 0
         discount_pct = 0
         if original_price_str:
-            orig_match = re.search(r'[\d,]+', original_price_str.replace(',', ''))
-            if orig_match:
-                original_total = float(orig_match.group().replace(',', ''))
+            original_total = _parse_price(original_price_str)
+            if original_total:
                 savings = original_total - total_accommodation
                 discount_pct = (savings / original_total * 100) if original_total > 0 else 0
 
         # Find cheaper alternatives in same location
         all_listings = search_result.get('searchResults', [])[:10]
-        cheaper_alternatives = []
+        candidates = []
 
         for alt in all_listings:
             if alt.get('id') == listing_id:
                 continue
 
-            alt_price_info = alt.get('structuredDisplayPrice', {}).get('primaryLine', {})
+            try:
+                alt_price_info = alt['structuredDisplayPrice']['primaryLine']
+            except (KeyError, TypeError):
+                alt_price_info = {}
             alt_price_str = alt_price_info.get('discountedPrice', '')
 
             if alt_price_str:
-                alt_match = re.search(r'[\d,]+', alt_price_str.replace(',', ''))
-                if alt_match:
-                    alt_price = float(alt_match.group().replace(',', ''))
-                    if alt_price < total_accommodation:
-                        potential_savings = total_accommodation - alt_price
-                        cheaper_alternatives.append({
-                            'id': alt.get('id'),
-                            'name': alt.get('title', 'Unknown'),
-                            'url': alt.get('url'),
-                            'price': alt_price,
-                            'savings': round(potential_savings, 2),
-                            'rating': alt.get('avgRatingLocalized', 'N/A')
-                        })
-
-        # Sort by savings
-        cheaper_alternatives.sort(key=lambda x: x['savings'], reverse=True)
-
-        logger.info(f"Budget calculation complete for listing {listing_id}")
-
-        return json.dumps({
+                alt_price = _parse_price(alt_price_str)
+                if alt_price and alt_price < total_accommodation:
+                    potential_savings = total_accommodation - alt_price
+                    candidates.append((round(potential_savings, 2), alt_price, alt))
+
+        # Top 3 by savings; nlargest matches a stable descending sort without sorting them all;
+        # result dicts are only built for the survivors
+        cheaper_alternatives = [{
+            'id': alt.get('id'),
+            'name': alt.get('title', 'Unknown'),
+            'url': alt.get('url'),
+            'price': alt_price,
+            'savings': alt_savings,
+            'rating': alt.get('avgRatingLocalized', 'N/A')
+        } for alt_savings, alt_price, alt in heapq.nlargest(3, candidates, key=itemgetter(0))]
+
+        logger.info("Budget calculation complete for listing %s", listing_id)
+
+        return {
             'listing_id': listing_id,
             'listing_name': listing.get('title', 'Unknown'),
             'listing_url': listing.get('url'),
@@ -176,15 +195,13 @@ async def airbnb_trip_budget(listing_id: str, checkin: str, checkout: str,
                 'discount_amount': round(savings, 2) if savings > 0 else 0,
                 'discount_percent': round(discount_pct, 1) if savings > 0 else 0
             },
-            'cheaper_alternatives': cheaper_alternatives[:3],  # Top 3
+            'cheaper_alternatives': cheaper_alternatives,
             'note': 'Service fee, tax, and cleaning fee are estimates. Actual amounts may vary at checkout.'
-        }, indent=2)
+        }
 
     except Exception as e:
-        logger.error(f"Trip budget calculation failed: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return json.dumps({
+        logger.exception("Trip budget calculation failed: %s", e)
+        return {
             'error': str(e),
             'listing_id': listing_id
-        }, indent=2)
+        }
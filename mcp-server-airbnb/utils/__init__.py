@@ -2,15 +2,30 @@
 Utility functions for Airbnb MCP Server
 """
 
-from .http_client import fetch_with_user_agent
-from .data_processing import clean_object, pick_by_schema, flatten_arrays_in_object
+from .http_client import fetch_with_user_agent, fetch_with_user_agent_bytes, fetch_with_validators, get_session, close_session
+from .data_processing import clean_object, pick_by_schema, flatten_arrays_in_object, compile_schema, extract_by_schema
 from .schemas import get_search_result_schema, get_listing_details_schema
+from .json_utils import json_dumps, json_loads
+from .page_data import extract_deferred_state
+from .cache import TTLCache
+from .dates import parse_date
 
 __all__ = [
     'fetch_with_user_agent',
+    'fetch_with_user_agent_bytes',
+    'fetch_with_validators',
+    'get_session',
+    'close_session',
     'clean_object',
     'pick_by_schema',
     'flatten_arrays_in_object',
+    'compile_schema',
+    'extract_by_schema',
     'get_search_result_schema',
     'get_listing_details_schema',
+    'json_dumps',
+    'json_loads',
+    'extract_deferred_state',
+    'TTLCache',
+    'parse_date',
 ]
@@ -0,0 +1,53 @@
+"""
+In-process cache for parsed tool results
+"""
+
+import asyncio
+import time
+import weakref
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """Bounded cache whose entries expire `ttl` seconds after they are stored
+
+    Expired entries stay until evicted, so get_stale can still return them
+    (e.g. to revalidate a page with its stored ETag)
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: dict[Hashable, tuple[float, Any]] = {}
+        # Held only while a miss is being filled; dropped once no caller waits
+        self._locks: "weakref.WeakValueDictionary[Hashable, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl:
+            return None
+        return entry[1]
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Return the stored value even if expired, or None if missing"""
+        entry = self._data.get(key)
+        return None if entry is None else entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the oldest entry once over maxsize"""
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic(), value)
+        if len(self._data) > self.maxsize:
+            # Dicts keep insertion order, so the first key is the oldest
+            del self._data[next(iter(self._data))]
+
+    def lock(self, key: Hashable) -> asyncio.Lock:
+        """Per-key lock so concurrent misses for the same key fill it only once"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -5,48 +5,48 @@ Data processing utilities for cleaning and filtering data
 
 def clean_object(obj):
     """Remove null/undefined values and __typename fields"""
-    if isinstance(obj, dict):
-        keys_to_delete = []
-        for key, value in obj.items():
-            if value is None or key == "__typename":
-                keys_to_delete.append(key)
-            elif isinstance(value, (dict, list)):
-                clean_object(value)
-        for key in keys_to_delete:
-            del obj[key]
-    elif isinstance(obj, list):
-        for item in obj:
-            clean_object(item)
+    # Explicit worklist instead of recursion: no frame per node and no
+    # RecursionError on deeply nested payloads
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            keys_to_delete = []
+            for key, value in node.items():
+                if value is None or key == "__typename":
+                    keys_to_delete.append(key)
+                elif isinstance(value, (dict, list)):
+                    stack.append(value)
+            for key in keys_to_delete:
+                del node[key]
+        elif isinstance(node, list):
+            stack.extend(item for item in node if isinstance(item, (dict, list)))
     return obj
 
 
 def pick_by_schema(obj, schema):
     """Filter object to only include fields specified in schema"""
-    if not isinstance(obj, dict) or obj is None:
-        return obj
-
+    # Lists before the dict check, so the schema is applied to each element
     if isinstance(obj, list):
         return [pick_by_schema(item, schema) for item in obj]
 
-    result = {}
-    for key, rule in schema.items():
-        if key in obj:
-            if rule is True:
-                result[key] = obj[key]
-            elif isinstance(rule, dict):
-                result[key] = pick_by_schema(obj[key], rule)
-    return result
+    if not isinstance(obj, dict):
+        return obj
+
+    return {key: obj[key] if rule is True else pick_by_schema(obj[key], rule)
+            for key, rule in schema.items()
+            if key in obj and (rule is True or isinstance(rule, dict))}
 
 
 def flatten_arrays_in_object(input_obj, in_array=False):
     """Flatten nested arrays and objects into readable strings"""
     if isinstance(input_obj, list):
         flat_items = [flatten_arrays_in_object(item, True) for item in input_obj]
-        return ', '.join(str(item) for item in flat_items)
+        return ', '.join(map(str, flat_items))
     elif isinstance(input_obj, dict):
         if in_array:
             values = [flatten_arrays_in_object(v, True) for v in input_obj.values()]
-            return ': '.join(str(v) for v in values)
+            return ': '.join(map(str, values))
         else:
             result = {}
             for key, value in input_obj.items():
@@ -54,3 +54,59 @@ def flatten_arrays_in_object(input_obj, in_array=False):
             return result
     else:
         return input_obj
+
+
+def _flatten_clean(value, in_array):
+    """flatten_arrays_in_object(clean_object(value)) without mutating value"""
+    if isinstance(value, list):
+        return ', '.join(map(str, [_flatten_clean(item, True) for item in value]))
+    elif isinstance(value, dict):
+        if in_array:
+            return ': '.join(map(str, [_flatten_clean(v, True) for k, v in value.items()
+                                       if v is not None and k != "__typename"]))
+        return {k: _flatten_clean(v, False) for k, v in value.items()
+                if v is not None and k != "__typename"}
+    else:
+        return value
+
+
+def compile_schema(schema):
+    """
+    Precompile a schema dict into a tuple of (key, sub_schema) pairs,
+    where sub_schema is None for `True` rules. Lets extract_by_schema skip
+    re-checking rule types for every object.
+    """
+    compiled = []
+    for key, rule in schema.items():
+        if key == "__typename":
+            continue
+        if rule is True:
+            compiled.append((key, None))
+        elif isinstance(rule, dict):
+            compiled.append((key, compile_schema(rule)))
+    return tuple(compiled)
+
+
+def extract_by_schema(obj, compiled, in_array=False):
+    """
+    Clean, filter and flatten an object in one pass using a compiled schema.
+    Same result as flatten_arrays_in_object(pick_by_schema(clean_object(obj), schema)),
+    but reads the raw object once and leaves it untouched.
+    """
+    if isinstance(obj, list):
+        return ', '.join(map(str, [extract_by_schema(item, compiled, True) for item in obj]))
+    if not isinstance(obj, dict):
+        return obj
+
+    result = {}
+    for key, sub in compiled:
+        value = obj.get(key)
+        if value is None:
+            continue
+        if sub is None:
+            result[key] = _flatten_clean(value, in_array)
+        else:
+            result[key] = extract_by_schema(value, sub, in_array)
+    if in_array:
+        return ': '.join(map(str, result.values()))
+    return result
@@ -0,0 +1,19 @@
+"""
+Date parsing for tool arguments
+"""
+
+import re
+from datetime import date, datetime
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# Zero-padded YYYY-MM-DD, which date.fromisoformat parses on a fast C path
+_CANONICAL_DATE_RE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+
+def parse_date(value: str) -> date:
+    """Parse a check-in/check-out date, accepting exactly what strptime('%Y-%m-%d') does"""
+    if _CANONICAL_DATE_RE.fullmatch(value):
+        return date.fromisoformat(value)
+    # Unpadded forms like '2025-9-5'; also raises the usual ValueError for bad input
+    return datetime.strptime(value, DATE_FORMAT).date()
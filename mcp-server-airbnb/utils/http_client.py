@@ -2,21 +2,140 @@
 HTTP client utilities for fetching Airbnb data
 """
 
+import asyncio
+import logging
+from typing import Optional
+
 import aiohttp
-from config import USER_AGENT
+from config import USER_AGENT, REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    # Pages are several MB uncompressed; aiohttp decodes br (via the Brotli
+    # package) and gzip transparently
+    "Accept-Encoding": "br, gzip, deflate",
+    "Cache-Control": "no-cache",
+}
+
+# Session-wide timeout; a slow connect fails fast instead of eating the whole budget
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, connect=5, sock_read=REQUEST_TIMEOUT)
+
+# One pooled session for the life of the server so repeat requests to
+# airbnb.com reuse keep-alive connections instead of a new TLS handshake
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+# Cap on concurrent requests across all tools, so parallel searches don't
+# trip Airbnb's throttling; throttled (429) requests are retried with backoff
+_SEMAPHORE = asyncio.Semaphore(8)
+_MAX_RETRIES = 3
+_MAX_RETRY_DELAY = 30.0
+
+# Fetches currently in progress, so identical concurrent requests share one
+_INFLIGHT: dict[tuple, asyncio.Task] = {}
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared session, creating it on first use"""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=64, limit_per_host=16, ttl_dns_cache=300, keepalive_timeout=75),
+            timeout=DEFAULT_TIMEOUT,
+            headers=DEFAULT_HEADERS,
+        )
+    return _SESSION
+
+
+async def close_session() -> None:
+    """Close the shared session (call on server shutdown)"""
+    global _SESSION
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+    _SESSION = None
+
+
+def _retry_delay(response: aiohttp.ClientResponse, attempt: int) -> float:
+    """Honour a numeric Retry-After header, else back off exponentially"""
+    try:
+        delay = float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        delay = 2.0 ** attempt
+    return min(delay, _MAX_RETRY_DELAY)
+
 
+# (ETag, Last-Modified) from an earlier response; (None, None) when there are none
+Validators = tuple[Optional[str], Optional[str]]
+_NO_VALIDATORS: Validators = (None, None)
 
-async def fetch_with_user_agent(url: str, timeout: int = 30) -> str:
+
+async def _fetch(url: str, timeout: Optional[int], as_bytes: bool, validators: Validators):
+    """Fetch url, returning (body, validators); body is None when the server answers 304"""
+    session = await get_session()
+    # Only build a timeout object when the caller overrides the default
+    request_timeout = DEFAULT_TIMEOUT if timeout is None else aiohttp.ClientTimeout(total=timeout, connect=5)
+
+    etag, last_modified = validators
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    async with _SEMAPHORE:
+        for attempt in range(_MAX_RETRIES + 1):
+            async with session.get(url, timeout=request_timeout, headers=headers) as response:
+                if response.status == 429 and attempt < _MAX_RETRIES:
+                    delay = _retry_delay(response, attempt)
+                else:
+                    if response.status == 304 and headers:
+                        logger.debug("Not modified: %s", url)
+                        return None, (response.headers.get("ETag", etag),
+                                      response.headers.get("Last-Modified", last_modified))
+                    if response.status != 200:
+                        raise Exception(f"HTTP {response.status}: {response.reason}")
+                    logger.debug("Content-Encoding: %s", response.headers.get('Content-Encoding'))
+                    body = await (response.read() if as_bytes else response.text())
+                    return body, (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            logger.warning("Rate limited by Airbnb, retrying in %.1fs (%d/%d)", delay, attempt + 1, _MAX_RETRIES)
+            await asyncio.sleep(delay)
+
+
+async def _fetch_single_flight(url: str, timeout: Optional[int], as_bytes: bool,
+                               validators: Validators = _NO_VALIDATORS):
+    """Run _fetch, letting concurrent callers for the same URL share one request"""
+    key = (url, as_bytes, validators)
+    task = _INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch(url, timeout, as_bytes, validators))
+        _INFLIGHT[key] = task
+
+        def _done(t: asyncio.Task) -> None:
+            del _INFLIGHT[key]
+            if not t.cancelled():
+                t.exception()  # retrieved here even if every caller was cancelled
+
+        task.add_done_callback(_done)
+    # shield: one caller being cancelled must not cancel the fetch for the others
+    return await asyncio.shield(task)
+
+
+async def fetch_with_user_agent(url: str, timeout: Optional[int] = None) -> str:
     """Fetch URL with proper headers"""
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Cache-Control": "no-cache",
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
-            if response.status != 200:
-                raise Exception(f"HTTP {response.status}: {response.reason}")
-            return await response.text()
+    body, _ = await _fetch_single_flight(url, timeout, as_bytes=False)
+    return body
+
+
+async def fetch_with_user_agent_bytes(url: str, timeout: Optional[int] = None) -> bytes:
+    """Fetch URL with proper headers, returning the undecoded body"""
+    body, _ = await _fetch_single_flight(url, timeout, as_bytes=True)
+    return body
+
+
+async def fetch_with_validators(url: str, validators: Validators = _NO_VALIDATORS,
+                                timeout: Optional[int] = None) -> tuple[Optional[bytes], Validators]:
+    """Fetch the undecoded body, revalidating with an earlier response's validators; body is None on 304"""
+    return await _fetch_single_flight(url, timeout, True, validators)
@@ -0,0 +1,16 @@
+"""
+JSON helpers backed by orjson
+"""
+
+import orjson
+
+json_loads = orjson.loads
+
+
+def json_dumps(obj, indent: int = 0) -> str:
+    """Serialize to compact str; indent=2 matches json.dumps(obj, indent=2) layout"""
+    # OPT_NON_STR_KEYS keeps json.dumps' tolerance for int/float dict keys
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, option=option).decode()
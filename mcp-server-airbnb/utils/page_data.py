@@ -0,0 +1,65 @@
+"""
+Extraction of the data Airbnb embeds in its server-rendered pages
+"""
+
+import logging
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from .json_utils import json_loads
+
+logger = logging.getLogger(__name__)
+
+# lxml is a declared dependency, but keep the fallback usable without it
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = 'lxml'
+except ImportError:
+    _HTML_PARSER = 'html.parser'
+
+# Search and listing pages embed their data in a single script tag; a targeted
+# regex is far cheaper than building a parse tree for the whole page. The body
+# is matched as runs of non-'<' bytes broken by a '<' that doesn't start
+# '</script>', which scans linearly instead of retrying a lazy .*? per byte
+_SCRIPT_RE = re.compile(rb'<script[^>]*id="data-deferred-state-0"[^>]*>([^<]*(?:<(?!/script>)[^<]*)*)</script>')
+
+# For the parser fallback: build only the data script element, not the full tree
+_STRAINER = SoupStrainer('script', attrs={'id': 'data-deferred-state-0'})
+
+
+def extract_deferred_state(html: bytes) -> dict:
+    """Return the niobe client data from a page's #data-deferred-state-0 script"""
+
+    # Find the data script element
+    script_match = _SCRIPT_RE.search(html)
+
+    if script_match:
+        # Script content is raw text in HTML, so no entity decoding is needed
+        script_content = script_match.group(1)
+    else:
+        # Markup the regex doesn't expect (quoting, attribute spelling); let a
+        # real parser have a go before giving up
+        logger.warning("Data script not matched by regex, falling back to BeautifulSoup")
+        script_elem = BeautifulSoup(html, _HTML_PARSER, parse_only=_STRAINER).find('script')
+        if not script_elem:
+            logger.error("Could not find #data-deferred-state-0 script element")
+            raise Exception("Could not find data script element - page structure may have changed")
+        # get_text() also covers scripts split into several text nodes, where .string is None
+        script_content = script_elem.get_text()
+
+    logger.info("Found data script element")
+
+    if not script_content:
+        raise Exception("Data script element is empty")
+
+    logger.info("Script content length: %d", len(script_content))
+
+    # Parse JSON
+    data = json_loads(script_content)
+
+    if 'niobeClientData' not in data:
+        logger.error("No niobeClientData in parsed JSON. Keys: %s", list(data.keys()))
+        raise Exception("Unexpected data structure - niobeClientData not found")
+
+    return data['niobeClientData'][0][1]
@@ -48,6 +48,23 @@ def get_search_result_schema():
 def get_listing_details_schema():
     """Schema for filtering listing details sections"""
     return {
+        "TITLE_DEFAULT": {
+            "title": True
+        },
+        "REVIEWS_DEFAULT": {
+            "overallRating": True,
+            "overallCount": True
+        },
+        "BOOK_IT_SIDEBAR": {
+            "structuredDisplayPrice": {
+                "primaryLine": {
+                    "price": True,
+                    "discountedPrice": True,
+                    "originalPrice": True,
+                    "qualifier": True
+                }
+            }
+        },
         "LOCATION_DEFAULT": {
             "lat": True,
             "lng": True,